@@ -1,266 +1,226 @@
-import os
-import psycopg2
 import requests
-import pandas as pd
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta, timezone
-import time
-from dateutil.parser import parse
 import logging
-import json
+import os
 import random
 
-# Set the path to the logs directory
-logs_dir = os.path.join(os.getcwd(), "src/logs")
-
-# Create the logs directory if it doesn't already exist
-if not os.path.exists(logs_dir):
-    os.makedirs(logs_dir)
-
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="""%(asctime)s,%(msecs)03d: %(levelname)-8s
-            [%(filename)s:%(lineno)d] %(message)s""",
-    datefmt="%Y-%m-%d:%H:%M:%S",
-    handlers=[
-        logging.FileHandler(os.path.join(logs_dir, "ap_news_scraper.log")),
-        logging.StreamHandler(),
-    ],
-)
-
-try:
-    from dotenv import load_dotenv
-
-    load_dotenv()
-except ImportError:
-    pass
-
-
-class APNews:
+import bootstrap
+from checkpoints import get_checkpoints
+from fetcher import Fetcher
+from fingerprints import get_fingerprints
+from frontier import get_frontier
+from http_cache import NOT_MODIFIED
+from http_session import stats
+from instrumentation import metrics
+from notifier import get_notifier
+from pages import get_pages
+from records import COLUMNS, RecordBuilder, select_since
+from registry import Scraper
+from retry import RetryPolicy
+
+
+class APNews(Scraper):
+    name = "ap_news"
     # constant
     DOMAIN = "https://apnews.com"
-
-    @staticmethod
-    def __get_most_recent_timestamp(source_url):
-        indexed_at = None
-        conn = None
-        try:
-            conn = psycopg2.connect(
-                host=os.getenv("DATABASE_HOST"),
-                database="verceldb",
-                user="default",
-                password=os.getenv("DATABASE_PASSWORD"),
-            )
-            cursor = conn.cursor()
-
-            query = f'SELECT "indexedAt" FROM "Source" WHERE url = \'https://apnews.com/hub/{source_url}\';'
-            cursor.execute(query)
-            result = cursor.fetchone()
-
-            if result is not None:
-                indexed_at = result[0]
-                print(f"indexedAt value for Source Apnews {source_url} : {indexed_at}")
-
-                current_time = datetime.now()
-                update_query = f'UPDATE "Source" SET "indexedAt" = %s WHERE url = \'https://apnews.com/hub/{source_url}\';'
-                cursor.execute(update_query, (current_time,))
-                conn.commit()
-
-                print(
-                    f"indexedAt value for Source Apnews {source_url} has been updated to current date and time."
-                )
-            else:
-                print("No record found with the specified URL.")
-
-            return indexed_at
-
-        except psycopg2.Error as error:
-            print(f"Error: {error}")
+    # hubs scraped unless told otherwise (APNEWS_HUBS or the "hubs" option),
+    # either a hub name or its full url
+    HUBS = ("cryptocurrency", "blockchain")
+
+    def __get_most_recent_timestamp(self, source_url):
+        # read from the shared checkpoint store (one query covers every
+        # source); the new value is only written back after a successful run
+        if self.checkpoints is None:
             return None
+        indexed_at = self.checkpoints.get(source_url)
+        if indexed_at is None:
+            print("No record found with the specified URL.")
+            return None
+        print(f"indexedAt value for Source Apnews {source_url} : {indexed_at}")
+        self.checkpoints.stage(source_url, datetime.now(), source=self.name)
+        return indexed_at
 
-        finally:
-            if conn:
-                cursor.close()
-                conn.close()
-
-    def __init__(self, *args):
+    def __init__(self, *args, hubs=None):
         if len(args) == 1:
-            self.url = args[0]
-        elif len(args) == 0:
-            pass
+            hubs = [args[0]]
+        elif hubs is None:
+            hubs = [hub for hub in os.getenv("APNEWS_HUBS", "").split(",") if hub] or self.HUBS
+        # hub url -> source name, e.g. "Apnews Cryptocurrency"
+        self.hubs = {self.__hub_url(hub): self.__hub_source(hub) for hub in hubs}
         # creating a logging object
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.WARNING)
         # setting connection pool to stop debug level messages
         urllib3_logger = logging.getLogger("urllib3.connectionpool")
         urllib3_logger.setLevel(logging.WARNING)
-        # setting variables to log at a discord channel
-        self.webhook_url = os.getenv("WEBHOOK_URL")
+        self.pages = get_pages()
+        self.retry_policy = RetryPolicy.from_env()
+        self.notifier = get_notifier()
+        self.fingerprints = get_fingerprints()
+        self.fetcher = Fetcher(retry_policy=self.retry_policy)
+        self.checkpoints = get_checkpoints()
+        self.frontier = get_frontier()
+
+    def __hub_url(self, hub):
+        hub = hub.strip()
+        return hub if hub.startswith("http") else f"{self.DOMAIN}/hub/{hub}"
+
+    def __hub_source(self, hub):
+        name = hub.strip().rstrip("/").rsplit("/", 1)[-1]
+        return f"Apnews {name.replace('-', ' ').title()}"
 
     # mines all urls from ap news main page
-    def __scrape_news_urls(self, source):
+    def __scrape_news_urls(self, hub_url):
         # mines all url's regardless of date (i.e at the moment)
-        html = self.__send_request(self.url)
+        source = self.hubs[hub_url]
+        html = self.__send_request(hub_url)
         if html is not None:  # handle exception if request was failed
             urls = html.find_all("a", attrs={"data-key": "card-headline"})
             news_urls = [url.attrs["href"] for url in urls]
             return list(set(news_urls))
         else:
             """logging.warning(
-                f"No URLs are found to scrape from {source} - {self.url}"
+                f"No URLs are found to scrape from {source} - {hub_url}"
             )"""  # instead of printig, we should log
             self.__log_to_discord(
-                f"No URLs are found to scrape from {source} - {self.url}"
+                f"No URLs are found to scrape from {source} - {hub_url}"
             )
             return None
 
     # mines urls after compariosion with the last index time from DB
-    def __scrape_updated_urls(self, source):
+    def __scrape_updated_urls(self, hub_url):
         # uses source url and identifies updated urls
         # return the list of them
-        html = self.__send_request(self.url)
+        source = self.hubs[hub_url]
+        html = self.__send_request(hub_url, cached=True)
+        if html is NOT_MODIFIED:
+            self.__log_to_discord(
+                f"hub page unchanged since last run, skipping [{hub_url}]",
+                color=16753920,
+            )
+            return []
         if html is not None:
             divs = html.findAll("div", class_="CardHeadline")
-            urls_with_dates = [
-                [
-                    each_div.find("a", attrs={"data-key": "card-headline"}).attrs[
-                        "href"
-                    ],
-                    datetime.strptime(
-                        each_div.find("span", attrs={"data-key": "timestamp"}).attrs[
-                            "data-source"
-                        ],
-                        "%Y-%m-%dT%H:%M:%SZ",
-                    ).strftime("%Y-%m-%d %H:%M:%S"),
-                ]
-                for each_div in divs
-            ]
-
-            start_date = datetime(2023, 1, 1, tzinfo=timezone.utc)
-            end_date = datetime(2023, 5, 1, tzinfo=timezone.utc)
-
-            random_dt = self.__random_date(start_date, end_date)
-            random_dt_str = random_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-            cut_off_date = datetime.strptime(random_dt_str, "%Y-%m-%dT%H:%M:%SZ")
-
-            """ self.__get_most_recent_timestamp(
-                self.url
-            )"""  # datetime.strptime('2023-03-17T00:00:00Z',"%Y-%m-%dT%H:%M:%SZ") #tested
+            hrefs, timestamps = [], []
+            for each_div in divs:
+                hrefs.append(
+                    each_div.find("a", attrs={"data-key": "card-headline"}).attrs["href"]
+                )
+                timestamps.append(
+                    each_div.find("span", attrs={"data-key": "timestamp"}).attrs[
+                        "data-source"
+                    ]
+                )
+
+            cut_off_date = self.__get_most_recent_timestamp(hub_url)
+            if cut_off_date is None:
+                # no checkpoint for this hub, test with a random date instead
+                start_date = datetime(2023, 1, 1, tzinfo=timezone.utc)
+                end_date = datetime(2023, 5, 1, tzinfo=timezone.utc)
+
+                random_dt = self.__random_date(start_date, end_date)
+                random_dt_str = random_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+                cut_off_date = datetime.strptime(random_dt_str, "%Y-%m-%dT%H:%M:%SZ")
             # generate a list of urls that needs re scraping as per date
             self.__log_to_discord(
-                f"last indexed date at DB: {cut_off_date} for [{self.url}]",
+                f"last indexed date at DB: {cut_off_date} for [{hub_url}]",
                 color=16776960,
             )
-            to_be_scraped_urls = [
-                each_article[0]  # index-1 contains url for respective dates
-                for each_article in urls_with_dates
-                if parse(each_article[1])
-                >= parse(cut_off_date.strftime("%Y-%m-%d %H:%M:%S"))
-            ]
+            # card timestamps are parsed in one go and compared as utc datetimes
+            to_be_scraped_urls = select_since(
+                hrefs, timestamps, cut_off_date, format="%Y-%m-%dT%H:%M:%SZ"
+            )
             if len(to_be_scraped_urls) > 0:
                 self.__log_to_discord(
                     ["".join([self.DOMAIN, url]) for url in to_be_scraped_urls],
                     color=16776960,
                 )
-            return list(set(to_be_scraped_urls))
+            return to_be_scraped_urls
 
         else:
             self.__log_to_discord(
-                f"No URLs are found to scrape from {source} - {self.url}"
+                f"No URLs are found to scrape from {source} - {hub_url}"
             )
             return None
 
-    def __scrape_content(self, urls, source):
-        # recives a list of urls and tries to scrape
-        if len(urls) != 0:  # hav to handle a exception here too
-            data_frame = pd.DataFrame(columns=["source", "url", "title", "content"])
-            for url in urls:
-                # scraped urls are missing domain name, so adding that before making request
-                current_url = "".join([self.DOMAIN, url])
-                html = self.__send_request(current_url)
-                if html is None:
-                    self.__log_to_discord(f"Bad url {current_url} for making request")
-                    continue
-
-                current_title = html.find("title")
-                current_content = html.find_all("p")
-                current_content = [
-                    para.text.rstrip("  No posts Ready for more?")
-                    for para in current_content
-                    if para.text is not None
-                ]
-                current_content = " ".join(current_content)
-                if len(current_content) == 0:
-                    """logging.debug(
-                        f"No content found at: {current_url}"
-                    )"""
-                    self.__log_to_discord(f"No content found at: {current_url}")
-                    # let's skip the urls that aren't having content and log them for future debugging
-                    continue
-                new_data_frame = pd.DataFrame(
-                    {
-                        "source": [source],
-                        "url": [current_url],
-                        "title": [current_title],
-                        "content": [current_content],
-                    }
-                )
+    def __scrape_content(self, hubs_by_url):
+        # recives url -> hubs it was listed on, each url is downloaded once.
+        # they go through the frontier, so stories an interrupted run didn't
+        # get to are picked up here and the ones it did aren't downloaded again
+        self.frontier.add(self.name, hubs_by_url)
+        todo = self.frontier.claim(self.name)
+        failed = []
+        if len(todo) != 0:
+            self.fetcher.map(
+                lambda url: self.__scrape_article(url, todo[url]),
+                list(todo),
+                on_error=lambda url, exception: self.__skip_article(url, exception, failed),
+            )
+        if failed:
+            raise RuntimeError(
+                f"{len(failed)} stories couldn't be downloaded, they are retried next run"
+            ) from failed[-1]
+        records = RecordBuilder(COLUMNS + ["hubs"])
+        records.extend(self.frontier.records(self.name))
+        return records.to_frame()
+
+    def __scrape_article(self, url, hubs):
+        # scraped urls are missing domain name, so adding that before making request
+        current_url = "".join([self.DOMAIN, url])
+        current_title, current_content = self.pages.article(current_url)
+        if len(current_content) == 0:
+            """logging.debug(
+                f"No content found at: {current_url}"
+            )"""
+            self.__log_to_discord(f"No content found at: {current_url}")
+            # let's skip the urls that aren't having content and log them for future debugging
+            self.frontier.finish(self.name, [(url, None)])
+            return
+        # source stays the first hub it was found on, the row is kept right away
+        record = [hubs[0], current_url, current_title, current_content, hubs]
+        self.frontier.finish(self.name, [(url, record)])
+
+    def __skip_article(self, url, exception, failed):
+        current_url = "".join([self.DOMAIN, url])
+        self.__log_to_discord(
+            f"problem with scraping [{current_url}]: {exception} No retries left. Check URL passed!"
+        )
+        if self.retry_policy.is_permanent(exception):
+            # the story is gone, there's nothing to come back for
+            self.frontier.finish(self.name, [(url, None)])
+        else:
+            # stays in the frontier and fails the run, so it's downloaded
+            # next time instead of dropped
+            failed.append(exception)
 
-                data_frame = pd.concat(
-                    [data_frame, new_data_frame], axis=0, ignore_index=True
-                )
+    # fine & exception hadled
 
-            return data_frame
+    def __fetch(self, url, cached=False):
+        # single attempt, retrying is up to the caller's retry policy
+        response = self.pages.get_cached(url) if cached else self.pages.get(url)
+        if response is NOT_MODIFIED:
+            return NOT_MODIFIED
+        from bs4 import BeautifulSoup
 
-    # fine & exception hadled
+        with metrics.timer("parse"):
+            return BeautifulSoup(response.text, "html.parser")
 
-    def __send_request(self, url, retries=3):
+    def __send_request(self, url, cached=False):
+        # cached requests return NOT_MODIFIED when the page is the same as last run
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            return BeautifulSoup(response.text, "html.parser")
+            return self.retry_policy.call(self.__fetch, url, cached=cached)
         except requests.exceptions.RequestException as exception:
-            if retries > 0:
-                # logging.debug(f'Error: While scraping {url} {exception}. Retrying in 5 seconds...')
-                time.sleep(5)
-                return self.__send_request(url, retries - 1)
-            else:
-                """self.logger.setLevel(logging.WARNING)
-                self.logger.warning(
-                    f"Problem with scraping [{url}]: {exception} After 3 retries, No retries left. Check URL passed!"
-                )"""
-                self.__log_to_discord(
-                    f"problem with scraping [{url}]: {exception} After 3 retries, No retries left. Check URL passed!"
-                )
-                return None
+            self.__log_to_discord(
+                f"problem with scraping [{url}]: {exception} No retries left. Check URL passed!"
+            )
+            return None
 
     # logs the errors to discord channel
 
-    def __log_to_discord(self, message, color=16711680, retries=3):  # by-default red
-        payload = self.__create_payload(message, color)
-        try:
-            response = requests.post(
-                self.webhook_url,
-                data=json.dumps(payload),
-                headers={"Content-Type": "application/json"},
-            )
-            response.raise_for_status()
-        except requests.exceptions.RequestException as exception:
-            if retries > 0:
-                # logging.debug(f'Error: While scraping {url} {exception}. Retrying in 5 seconds...')
-                time.sleep(5)
-                return self.__log_to_discord(message, retries - 1)
-            else:
-                """self.logger.setLevel(logging.WARNING)
-                self.logger.warning(
-                    f"Error Logging to discord: {exception} After 3 retries, No retries left. Check/Debug URL passed!"
-                )"""
-                # logs to local file after 3 failed calls
-                self.logger.error(
-                    f"Error Logging to discord: {exception} After 3 retries, No retries left. Check/Debug URL passed!"
-                )
-                return None
+    def __log_to_discord(self, message, color=16711680):  # by-default red
+        # queued, the shared sink batches and delivers in the background
+        self.notifier.send(self.__create_payload(message, color))
 
     def __create_payload(self, message, color=16711680):
         if isinstance(message, list):
@@ -296,49 +256,46 @@ class APNews:
         return start + timedelta(seconds=random_second)
 
     def scrape(self):
+        self.retry_policy.start()
         self.__log_to_discord("initiating ap-news scraper", color=65280)
         # currently modified to scrape only updated urls
-        obj1 = APNews("https://apnews.com/hub/cryptocurrency")
-        obj2 = APNews("https://apnews.com/hub/blockchain")
 
         # working super fine
-        # df1_urls = obj1.__scrape_news_urls("Apnews Cryptocurrency")
-        # df2_urls = obj2.__scrape_news_urls("Apnews Blockchain")
-
-        df1_urls = obj1.__scrape_updated_urls("Apnews Cryptocurrency")
-        df2_urls = obj2.__scrape_updated_urls("Apnews Blockchain")
-
-        if df1_urls is not None:
-            df1 = obj1.__scrape_content(df1_urls, "Apnews Cryptocurrency")
-        else:
-            df1 = None
-        if df2_urls is not None:
-            df2 = obj2.__scrape_content(df2_urls, "Apnews Blockchain")
-        else:
-            df2 = None
-
-        dfs_to_concat = []
-
-        if df1 is not None:
-            dfs_to_concat.append(df1)
-        else:
-            # self.logger.info(f'No updates found at Apnews Cryptocurrency')
-            self.__log_to_discord(
-                "No updates found at Apnews Cryptocurrency", color=16753920
-            )  # orange
-
-        if df2 is not None:
-            dfs_to_concat.append(df2)
-        else:
-            # self.logger.info(f'No updates found at Apnews Blockchain')
-            self.__log_to_discord(
-                "No updates found at Apnews Blockchain", color=16753920
-            )
+        # candidates = self.fetcher.map(self.__scrape_news_urls, hub_urls)
+
+        # every hub page is fetched at the same time, and stories listed on
+        # more than one hub are merged so they're only downloaded once
+        hub_urls = list(self.hubs)
+        failed = []
+        candidates = self.fetcher.map(
+            self.__scrape_updated_urls,
+            hub_urls,
+            on_error=lambda hub_url, exception: failed.append((hub_url, exception)),
+        )
+        if failed:
+            # none of the listings made it to the frontier, so every hub has to
+            # be read in full next run instead of being answered with a 304
+            for hub_url in hub_urls:
+                self.pages.http_cache.invalidate(hub_url)
+            for hub_url, exception in failed:
+                self.__log_to_discord(f"failed to read hub [{hub_url}]: {exception!r}")
+            raise failed[0][1]
+        hubs_by_url = {}
+        for hub_url, urls in zip(hub_urls, candidates):
+            if not urls:
+                # self.logger.info(f'No updates found at {self.hubs[hub_url]}')
+                self.__log_to_discord(
+                    f"No updates found at {self.hubs[hub_url]}", color=16753920
+                )  # orange
+                continue
+            for url in urls:
+                hubs_by_url.setdefault(url, []).append(self.hubs[hub_url])
 
-        if len(dfs_to_concat) > 0:
-            df = pd.concat(dfs_to_concat, ignore_index=True)
-            df = df.drop_duplicates(subset="url", keep="first")
-            df.reset_index(drop=True, inplace=True)
+        # an interrupted run can leave stories behind even when nothing is new
+        if len(hubs_by_url) > 0 or self.frontier.counts(self.name):
+            df = self.__scrape_content(hubs_by_url)
+            # drop articles whose text is the same as the last time we saw them
+            df = self.fingerprints.drop_unchanged(df, source=self.name)
             self.__log_to_discord(
                 f"scraping successful... {df.shape[0]} urls are updated!", color=65280
             )  # green
@@ -351,10 +308,18 @@ class APNews:
         self.__log_to_discord("finished scraping ap-news!!", color=65280)
 
 
-obj = APNews()  # working
-print(
-    obj.scrape()
-)  # working invokes __scrape_ap_news,__scrape_updated_urls, __scrape_content
+if __name__ == "__main__":
+    bootstrap.load_env()
+    bootstrap.setup_logging("ap_news_scraper.log")
+    obj = APNews()  # working
+    print(
+        obj.scrape()
+    )  # working invokes __scrape_ap_news,__scrape_updated_urls, __scrape_content
+    # the output is out, move the checkpoints forward
+    import runner
+
+    runner.commit_sources([obj.name])
+    print(f"http connections: {stats.as_dict()}")
 
 # end = time.time()
 # print(end - start)
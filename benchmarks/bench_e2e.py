@@ -0,0 +1,244 @@
+"""offline end-to-end run of every scraper from a record/replay cassette.
+
+usage: python benchmarks/bench_e2e.py [--cassette DIR] [--latency 0.05]
+                                      [--error-rate 0.02] [--sources ap_news ...]
+
+each source runs its real scrape() in a fresh interpreter with HTTP_REPLAY
+pointed at the cassette, so nothing leaves the machine, and reports rows,
+throughput, per-request latency (p50/p95/p99 per host) and peak RSS.
+
+without an existing cassette one is synthesized first: the scrapers run in
+record mode against a generated apnews/flywheel/IQ Wiki site (hub pages,
+sitemap, articles and GraphQL answers). a cassette recorded from the live
+sites (HTTP_REPLAY=record:<dir> python runner.py) works the same way, as long
+as the replayed run asks for the same urls.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from requests.adapters import BaseAdapter  # noqa: E402
+
+from mock_graphql import MockGraphQL, make_wikis  # noqa: E402
+
+SOURCES = ("ap_news", "flywheel", "iq_wiki")
+HUBS = ("cryptocurrency", "blockchain")
+# after every random cut-off the scrapers pick, so the same urls get
+# requested whatever the seed
+PUBLISHED = datetime(2023, 6, 1, tzinfo=timezone.utc)
+SEED = 7
+
+
+def _article(title, paragraphs):
+    body = "".join(f"<p>{title} paragraph {index}. {'lorem ipsum ' * 40}</p>" for index in range(paragraphs))
+    return f"<html><head><title>{title}</title></head><body>{body}</body></html>"
+
+
+class SyntheticSite(BaseAdapter):
+    """generated answers for every url the three scrapers ask for.
+
+    the hubs share half their stories, like the real ones do.
+    """
+
+    def __init__(self, articles=200, wikis=500, paragraphs=8):
+        super().__init__()
+        self.articles = articles
+        self.paragraphs = paragraphs
+        self.graphql = MockGraphQL(make_wikis(wikis), start=PUBLISHED)
+
+    def __hub(self, name):
+        offset = HUBS.index(name) * self.articles // 2
+        cards = "".join(
+            '<div class="CardHeadline">'
+            f'<a data-key="card-headline" href="/article/story-{index}">Story {index}</a>'
+            f'<span data-key="timestamp" data-source="{PUBLISHED:%Y-%m-%d}T{index % 24:02d}:00:00Z"></span>'
+            "</div>"
+            for index in range(offset, offset + self.articles)
+        )
+        return f"<html><body>{cards}</body></html>"
+
+    def __sitemap(self):
+        urls = "".join(
+            f"<url><loc>https://flywheeldefi.com/p/post-{index}</loc>"
+            f"<lastmod>{PUBLISHED:%Y-%m-%d}</lastmod></url>"
+            for index in range(self.articles)
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+        )
+
+    def __answer(self, request):
+        parts = urlsplit(request.url)
+        host, path = parts.netloc, parts.path
+        if path == "/robots.txt":
+            text = "User-agent: *\nAllow: /\n"
+            if host == "flywheeldefi.com":
+                text += "Sitemap: https://flywheeldefi.com/sitemap.xml\n"
+            return 200, "text/plain", text
+        if host == "apnews.com" and path.startswith("/hub/") and path[5:] in HUBS:
+            return 200, "text/html; charset=utf-8", self.__hub(path[5:])
+        if host == "apnews.com" and path.startswith("/article/"):
+            return 200, "text/html; charset=utf-8", _article(path[9:], self.paragraphs)
+        if host == "flywheeldefi.com" and path == "/sitemap.xml":
+            return 200, "application/xml", self.__sitemap()
+        if host == "flywheeldefi.com" and path.startswith("/p/"):
+            return 200, "text/html; charset=utf-8", _article(path[3:], self.paragraphs)
+        if host == "graph.everipedia.org" and request.method == "POST":
+            query = json.loads(request.body or b"{}").get("query", "")
+            return 200, "application/json", json.dumps({"data": self.graphql.resolve(query)})
+        return 404, "text/html", "not found"
+
+    def send(self, request, **kwargs):
+        from replay import build_response
+
+        status, content_type, text = self.__answer(request)
+        content = b"" if request.method == "HEAD" else text.encode("utf-8")
+        return build_response(request, status, {"Content-Type": content_type}, content, adapter=self)
+
+    def close(self):
+        pass
+
+
+def _prepare_env(workdir):
+    # everything stateful goes to a throwaway directory, nothing to discord/postgres
+    for name in ("DATABASE_HOST", "CHECKPOINT_DB", "WEBHOOK_URL", "IQ_WIKI_GRAPHQL_URL", "SCRAPER_SINKS"):
+        os.environ.pop(name, None)
+    os.environ.update(
+        HTTP_CACHE_DIR=os.path.join(workdir, "http"),
+        FINGERPRINT_DB=os.path.join(workdir, "fingerprints.sqlite3"),
+        FRONTIER_DB=os.path.join(workdir, "frontier.sqlite3"),
+        SITEMAP_DISCOVERY_CACHE=os.path.join(workdir, "sitemap_discovery.json"),
+        NOTIFY_SINK=f"file:{os.path.join(workdir, 'notifications.jsonl')}",
+    )
+    os.environ.setdefault("RATE_LIMIT", "0")
+
+
+def child(args):
+    import random
+
+    random.seed(SEED)
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    _prepare_env(workdir)
+    if args.child == "replay":
+        os.environ["HTTP_REPLAY"] = f"replay:{args.cassette}"
+
+    import resource
+
+    import replay
+    import runner
+    from http_session import get_session
+    from instrumentation import metrics
+    from notifier import get_notifier
+
+    if args.child == "record":
+        site = SyntheticSite(args.articles, args.wikis)
+        replay.install(get_session(), f"record:{args.cassette}", inner=site)
+
+    report = {}
+    for name in args.sources:
+        metrics.reset()
+        result = runner.run_source(name)
+        get_notifier().flush()
+        data = metrics.as_dict()
+        requests_made = sum(
+            counter["value"]
+            for counter in data["counters"]
+            if counter["name"] == "http_requests" and counter["source"] == name
+        )
+        fetch = {
+            timer["host"]: {key: timer[key] for key in ("count", "p50", "p95", "p99")}
+            for timer in data["timers"]
+            if timer["stage"] == "fetch" and timer["source"] == name
+        }
+        report[name] = {
+            "ok": result.ok,
+            "rows": result.rows,
+            "elapsed": result.elapsed,
+            "requests": requests_made,
+            "fetch": fetch,
+        }
+    # linux reports kilobytes
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    for entry in report.values():
+        entry["peak_rss_mb"] = peak_rss_mb
+    print(json.dumps(report))
+
+
+def _spawn(mode, sources, args, extra_env=None):
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--child",
+        mode,
+        "--cassette",
+        args.cassette,
+        "--articles",
+        str(args.articles),
+        "--wikis",
+        str(args.wikis),
+        "--sources",
+        *sources,
+    ]
+    env = dict(os.environ, **(extra_env or {}))
+    completed = subprocess.run(command, capture_output=True, text=True, env=env, cwd=ROOT)
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        raise SystemExit(f"{mode} run failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cassette", default=os.path.join(ROOT, ".cache", "cassettes", "synthetic"))
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of responses turned into 503s")
+    parser.add_argument("--sources", nargs="+", default=list(SOURCES), choices=SOURCES)
+    parser.add_argument("--articles", type=int, default=200, help="stories per hub / sitemap (synthetic)")
+    parser.add_argument("--wikis", type=int, default=500, help="wikis (synthetic)")
+    parser.add_argument("--child", choices=("record", "replay"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args)
+
+    if not os.path.isdir(args.cassette) or not os.listdir(args.cassette):
+        start = time.perf_counter()
+        _spawn("record", list(SOURCES), args)
+        print(f"synthesized cassette {args.cassette} in {time.perf_counter() - start:.1f}s")
+
+    replay_env = {
+        "HTTP_REPLAY_LATENCY": str(args.latency),
+        "HTTP_REPLAY_ERROR_RATE": str(args.error_rate),
+        "HTTP_REPLAY_SEED": str(SEED),
+    }
+    print(f"latency {args.latency}s, error rate {args.error_rate:.0%}")
+    for name in args.sources:
+        # one interpreter per source so peak RSS belongs to that scraper alone
+        entry = _spawn("replay", [name], args, replay_env)[name]
+        rate = entry["rows"] / entry["elapsed"] if entry["elapsed"] else 0.0
+        status = "ok" if entry["ok"] else "FAILED"
+        print(
+            f"{name}: {status}, {entry['rows']} rows in {entry['elapsed']:.2f}s "
+            f"({rate:.0f} rows/s), {entry['requests']} requests, "
+            f"peak rss {entry['peak_rss_mb']:.0f} MB"
+        )
+        for host, fetch in sorted(entry["fetch"].items()):
+            print(
+                f"    {host}: {fetch['count']} requests, p50 {fetch['p50'] * 1000:.0f} ms, "
+                f"p95 {fetch['p95'] * 1000:.0f} ms, p99 {fetch['p99'] * 1000:.0f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
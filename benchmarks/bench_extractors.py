@@ -0,0 +1,74 @@
+"""per-page extraction cost: full html.parser tree vs the extractor backends.
+
+usage: python benchmarks/bench_extractors.py [directory of saved .html pages]
+
+without a directory a synthetic corpus shaped like AP and Flywheel (substack)
+article pages is used.
+"""
+import glob
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractors import BACKENDS, _join_paragraphs  # noqa: E402
+
+
+def synthetic_page(index, style):
+    nav = "".join(f'<li><a href="/hub/topic-{n}">Topic {n}</a></li>' for n in range(80))
+    scripts = "".join(f"<script>window.__data{n} = {{a: {n}, b: 'x'}};</script>" for n in range(20))
+    paragraphs = "".join(
+        f"<p>Paragraph {n} of article {index} with <a href='/x'>a link</a> and "
+        f"<em>some emphasis</em>, plus enough words to look like real copy.</p>"
+        for n in range(40)
+    )
+    footer = "<p>No posts</p><p>Ready for more?</p>" if style == "flywheel" else ""
+    return (
+        f"<html><head><title>{style} article {index}</title>{scripts}</head><body>"
+        f"<nav><ul>{nav}</ul></nav><div class='RichTextStoryBody'>{paragraphs}</div>"
+        f"<aside>{nav}</aside>{footer}</body></html>"
+    )
+
+
+def load_corpus(directory):
+    if directory:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+            with open(path, "r", encoding="utf-8", errors="replace") as file:
+                pages.append(file.read())
+        return pages
+    return [synthetic_page(n, "ap" if n % 2 else "flywheel") for n in range(100)]
+
+
+def extract_full_tree(html):
+    # what the scrapers used to do for every article
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.find("title")
+    title = title.get_text() if title is not None else None
+    return title, _join_paragraphs(para.text for para in soup.find_all("p"))
+
+
+def main():
+    pages = load_corpus(sys.argv[1] if len(sys.argv) > 1 else None)
+    if not pages:
+        sys.exit("no pages found")
+    candidates = [("html.parser tree", extract_full_tree)] + sorted(BACKENDS.items())
+    baseline = [extract_full_tree(page) for page in pages]
+
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KiB on average")
+    for name, extract in candidates:
+        start = time.perf_counter()
+        results = [extract(page) for page in pages]
+        elapsed = time.perf_counter() - start
+        mismatches = sum(result != expected for result, expected in zip(results, baseline))
+        print(
+            f"{name:>18}: {elapsed / len(pages) * 1000:7.2f} ms/page, "
+            f"{mismatches} pages differ from html.parser"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""sequential vs windowed GraphQL pagination against the local mock server.
+
+usage: python benchmarks/bench_pagination.py [total_wikis] [latency_seconds]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# the mock is local, measure pagination rather than the politeness limits
+os.environ.setdefault("RATE_LIMIT", "0")
+
+from http_session import get_session  # noqa: E402
+from mock_graphql import MockGraphQLServer  # noqa: E402
+from paginator import Paginator  # noqa: E402
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    session = get_session()
+
+    with MockGraphQLServer(total=total, latency=latency) as server:
+
+        def fetch_page(offset, limit):
+            query = f"{{ wikis(limit: {limit}, offset: {offset}) {{ id title content }} }}"
+            response = session.post(server.url, json={"query": query})
+            response.raise_for_status()
+            return response.json()["data"]["wikis"]
+
+        for window in (1, 2, 4, 8):
+            server.requests_served = 0
+            paginator = Paginator(fetch_page, window=window)
+            start = time.perf_counter()
+            ids = [wiki["id"] for page in paginator for wiki in page]
+            elapsed = time.perf_counter() - start
+            assert ids == [f"wiki-{index}" for index in range(total)]
+            print(
+                f"window={window}: {elapsed:.2f}s for {len(ids)} wikis, "
+                f"{paginator.requested_pages} pages requested, "
+                f"{paginator.cancelled_pages} cancelled"
+            )
+
+
+if __name__ == "__main__":
+    main()
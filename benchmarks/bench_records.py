@@ -0,0 +1,71 @@
+"""compares per-row pd.concat against RecordBuilder for growing row counts.
+
+usage: python benchmarks/bench_records.py [max_concat_rows]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import COLUMNS, RecordBuilder  # noqa: E402
+
+SIZES = [100, 1_000, 10_000, 100_000]
+
+
+def rows(count):
+    for index in range(count):
+        yield (
+            "IQ Wiki",
+            f"https://iq.wiki/wiki/wiki-{index}",
+            f"title {index}",
+            "lorem ipsum dolor sit amet " * 20,
+        )
+
+
+def build_with_concat(count):
+    data_frame = pd.DataFrame(columns=COLUMNS)
+    for source, url, title, content in rows(count):
+        new_data_frame = pd.DataFrame(
+            {"source": [source], "url": [url], "title": [title], "content": [content]}
+        )
+        data_frame = pd.concat([data_frame, new_data_frame], axis=0, ignore_index=True)
+    return data_frame
+
+
+def build_with_builder(count):
+    records = RecordBuilder()
+    for row in rows(count):
+        records.append(*row)
+    return records.to_frame()
+
+
+def measure(func, count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    data_frame = func(count)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(data_frame) == count
+    return elapsed, peak / 2**20
+
+
+def main():
+    # per-row concat is quadratic, past a few thousand rows it takes minutes
+    max_concat_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    print(f"{'rows':>8} {'method':>8} {'seconds':>10} {'peak MiB':>10}")
+    for count in SIZES:
+        methods = [("builder", build_with_builder)]
+        if count <= max_concat_rows:
+            methods.insert(0, ("concat", build_with_concat))
+        for name, func in methods:
+            elapsed, peak = measure(func, count)
+            print(f"{count:>8} {name:>8} {elapsed:>10.3f} {peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
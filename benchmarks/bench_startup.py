@@ -0,0 +1,63 @@
+"""startup regression check: importing the runner and every scraper must stay
+cheap and must not pull in the heavy dependencies.
+
+usage: python benchmarks/bench_startup.py [budget_ms]
+
+runs `python -X importtime` in a fresh interpreter, prints the slowest
+imports and exits non-zero when a heavy module got imported eagerly or the
+total import time is over budget (STARTUP_BUDGET_MS, default 250ms).
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["runner", "registry", "ap_news", "fly_wheel", "iq_wikis"]
+# only allowed once a scrape actually needs them
+LAZY = ["pandas", "bs4", "psycopg2", "lxml", "dateutil", "pyarrow"]
+
+
+def measure():
+    code = (
+        f"import sys; import {', '.join(MODULES)}; "
+        f"print(','.join(m for m in {LAZY!r} if m in sys.modules))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:  self [us] | cumulative | imported package"
+        _, cumulative_us, name = line.split("|")
+        imports.append((int(cumulative_us), name[1:].rstrip()))
+    loaded = [name for name in completed.stdout.strip().split(",") if name]
+    # nested imports are indented, only count our own top level modules
+    total = sum(cumulative for cumulative, name in imports if name in MODULES)
+    return total / 1000, sorted(imports, reverse=True)[:10], loaded
+
+
+def main():
+    budget = float(sys.argv[1] if len(sys.argv) > 1 else os.getenv("STARTUP_BUDGET_MS", "250"))
+    total_ms, slowest, loaded = measure()
+    print(f"importing {', '.join(MODULES)}: {total_ms:.1f} ms (budget {budget:.0f} ms)")
+    for cumulative, name in slowest:
+        print(f"{cumulative / 1000:8.1f} ms {name}")
+
+    failures = []
+    if loaded:
+        failures.append(f"imported eagerly: {', '.join(loaded)}")
+    if total_ms > budget:
+        failures.append(f"{total_ms:.1f} ms is over the {budget:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""a tiny local stand-in for the IQ Wiki GraphQL endpoint.
+
+only understands the queries the scrapers send: `wikis(limit:, offset:)`,
+`activities` (with or without wiki bodies) and aliased `wiki(id:)` lookups.
+every response is delayed by `latency` seconds to mimic a remote server.
+"""
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WIKIS_QUERY = re.compile(r"wikis\(\s*limit:\s*(\d+),\s*offset:\s*(\d+)\s*\)")
+WIKI_QUERY = re.compile(r"(\w+):\s*wiki\(id:\s*\"([^\"]+)\"\)")
+
+
+def make_activities(wikis, start=datetime(2023, 1, 1, tzinfo=timezone.utc)):
+    # one activity per wiki, an hour apart, oldest first
+    return [
+        {"datetime": (start + timedelta(hours=index)).isoformat(), "wiki": wiki}
+        for index, wiki in enumerate(wikis)
+    ]
+
+
+def make_wikis(total, content_size=2000):
+    return [
+        {
+            "id": f"wiki-{index}",
+            "title": f"Wiki {index}",
+            "content": ("lorem ipsum " * content_size)[:content_size],
+        }
+        for index in range(total)
+    ]
+
+
+class MockGraphQL:
+    # the data and query resolution, without a server around it
+    def __init__(self, wikis=None, total=1000, start=None):
+        self.wikis = wikis if wikis is not None else make_wikis(total)
+        self.by_id = {wiki["id"]: wiki for wiki in self.wikis}
+        if start is None:
+            self.activities = make_activities(self.wikis)
+        else:
+            self.activities = make_activities(self.wikis, start)
+
+    def resolve(self, query):
+        match = WIKIS_QUERY.search(query)
+        if match:
+            limit, offset = int(match.group(1)), int(match.group(2))
+            return {"wikis": self.wikis[offset : offset + limit]}
+        if "activities" in query:
+            with_bodies = "title" in query
+            return {
+                "activities": [
+                    {
+                        "datetime": activity["datetime"],
+                        "content": [
+                            activity["wiki"] if with_bodies else {"id": activity["wiki"]["id"]}
+                        ],
+                    }
+                    for activity in self.activities
+                ]
+            }
+        return {
+            alias: self.by_id.get(wiki_id) for alias, wiki_id in WIKI_QUERY.findall(query)
+        }
+
+
+class MockGraphQLServer(MockGraphQL):
+    def __init__(self, wikis=None, total=1000, latency=0.05):
+        super().__init__(wikis, total)
+        self.latency = latency
+        self.requests_served = 0
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(("127.0.0.1", 0), self.__handler())
+        self.__thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.__server.server_port}/graphql"
+
+    def __handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                query = json.loads(self.rfile.read(length) or b"{}").get("query", "")
+                time.sleep(mock.latency)
+                mock.count_request()
+                body = json.dumps({"data": mock.resolve(query)}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def count_request(self):
+        with self.__lock:
+            self.requests_served += 1
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
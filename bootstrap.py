@@ -0,0 +1,36 @@
+"""process setup that used to happen at import time.
+
+entry points (runner.py and the scrapers' __main__ blocks) call these, so
+importing a scraper module has no side effects.
+"""
+import logging
+import os
+
+
+def load_env():
+    try:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+    except ImportError:
+        pass
+
+
+def setup_logging(filename="scraper.log"):
+    # Set the path to the logs directory
+    logs_dir = os.path.join(os.getcwd(), "src/logs")
+
+    # Create the logs directory if it doesn't already exist
+    if not os.path.exists(logs_dir):
+        os.makedirs(logs_dir)
+
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format="""%(asctime)s,%(msecs)03d: %(levelname)-8s
+            [%(filename)s:%(lineno)d] %(message)s""",
+        datefmt="%Y-%m-%d:%H:%M:%S",
+        handlers=[
+            logging.FileHandler(os.path.join(logs_dir, filename)),
+            logging.StreamHandler(),
+        ],
+    )
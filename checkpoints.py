@@ -0,0 +1,244 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from instrumentation import metrics
+
+
+def database_settings():
+    # psycopg2 connection arguments for the shared postgres database
+    return {
+        "host": os.getenv("DATABASE_HOST"),
+        "database": "verceldb",
+        "user": "default",
+        "password": os.getenv("DATABASE_PASSWORD"),
+    }
+
+
+class CheckpointStore:
+    """"indexedAt" bookkeeping for the "Source" table.
+
+    every source's value is read with a single query the first time any of
+    them is asked for. new values are only staged while scraping and written
+    back together, in one statement, by commit() once the run succeeded.
+    subclasses provide the connection and the two statements.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__loaded = None
+        self.__staged = {}  # url -> (indexed_at, source name)
+
+    @contextmanager
+    def _connection(self):
+        raise NotImplementedError
+
+    def _select_all(self, cursor):
+        raise NotImplementedError
+
+    def _update_many(self, cursor, rows):
+        raise NotImplementedError
+
+    def _errors(self):
+        # exception types that mean the database is unavailable
+        return ()
+
+    def __load(self):
+        try:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    return dict(self._select_all(cursor))
+                finally:
+                    cursor.close()
+        except self._errors() as error:
+            print(f"Error: {error}")
+            return None
+
+    def get(self, url):
+        with self.__lock:
+            if self.__loaded is None:
+                with metrics.timer("checkpoint"):
+                    # a failed load isn't kept, the next get() tries again
+                    self.__loaded = self.__load()
+                if self.__loaded is None:
+                    return None
+            return self.__loaded.get(url)
+
+    def stage(self, url, indexed_at, source=None):
+        with self.__lock:
+            self.__staged[url] = (indexed_at, source)
+
+    def discard(self, sources=None):
+        with self.__lock:
+            for url in self.__pending(sources):
+                del self.__staged[url]
+
+    def __pending(self, sources):
+        return [
+            url
+            for url, (_, source) in self.__staged.items()
+            if sources is None or source in sources
+        ]
+
+    def commit(self, sources=None):
+        # writes what was staged (for the given source names, or everything)
+        # in one batched update. returns how many rows were written
+        with self.__lock:
+            urls = self.__pending(sources)
+            if not urls:
+                return 0
+            rows = [(url, self.__staged[url][0]) for url in urls]
+            try:
+                with metrics.timer("checkpoint"), self._connection() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        self._update_many(cursor, rows)
+                        conn.commit()
+                    finally:
+                        cursor.close()
+            except self._errors() as error:
+                print(f"Error: {error}")
+                return 0
+            for url, indexed_at in rows:
+                del self.__staged[url]
+                if self.__loaded is not None:
+                    self.__loaded[url] = indexed_at
+            print(f'indexedAt updated for {len(rows)} sources in "Source"')
+            return len(rows)
+
+    def close(self):
+        pass
+
+
+class PostgresCheckpointStore(CheckpointStore):
+    def __init__(self, minconn=1, maxconn=None, **connect_kwargs):
+        super().__init__()
+        self.minconn = minconn
+        self.maxconn = maxconn or int(os.getenv("DATABASE_POOL_SIZE", "4"))
+        self.connect_kwargs = connect_kwargs or database_settings()
+        self.__pool = None
+        self.__pool_lock = threading.Lock()
+
+    def _errors(self):
+        import psycopg2
+
+        return (psycopg2.Error,)
+
+    def __get_pool(self):
+        if self.__pool is None:
+            with self.__pool_lock:
+                if self.__pool is None:
+                    from psycopg2.pool import ThreadedConnectionPool
+
+                    self.__pool = ThreadedConnectionPool(
+                        self.minconn, self.maxconn, **self.connect_kwargs
+                    )
+        return self.__pool
+
+    @contextmanager
+    def _connection(self):
+        pool = self.__get_pool()
+        conn = pool.getconn()
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn)
+
+    def _select_all(self, cursor):
+        cursor.execute('SELECT url, "indexedAt" FROM "Source";')
+        return cursor.fetchall()
+
+    def _update_many(self, cursor, rows):
+        from psycopg2.extras import execute_values
+
+        execute_values(
+            cursor,
+            'UPDATE "Source" AS s SET "indexedAt" = v.indexed_at '
+            "FROM (VALUES %s) AS v (url, indexed_at) WHERE s.url = v.url;",
+            rows,
+            template="(%s, %s::timestamp)",
+        )
+
+    def close(self):
+        if self.__pool is not None:
+            self.__pool.closeall()
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    # same "Source" table in a local sqlite file, for runs without postgres
+    def __init__(self, path):
+        super().__init__()
+        import sqlite3
+
+        self.path = path
+        self.__sqlite3 = sqlite3
+        self.__conn_lock = threading.Lock()
+        self.__conn = sqlite3.connect(
+            path,
+            check_same_thread=False,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+        )
+        self.__conn.execute(
+            'CREATE TABLE IF NOT EXISTS "Source" (url TEXT PRIMARY KEY, "indexedAt" TIMESTAMP)'
+        )
+        self.__conn.commit()
+
+    def _errors(self):
+        return (self.__sqlite3.Error,)
+
+    @contextmanager
+    def _connection(self):
+        with self.__conn_lock:
+            try:
+                yield self.__conn
+            except Exception:
+                self.__conn.rollback()
+                raise
+
+    def _select_all(self, cursor):
+        cursor.execute('SELECT url, "indexedAt" FROM "Source"')
+        return cursor.fetchall()
+
+    def _update_many(self, cursor, rows):
+        cursor.executemany(
+            'UPDATE "Source" SET "indexedAt" = ? WHERE url = ?',
+            [(indexed_at, url) for url, indexed_at in rows],
+        )
+
+    def close(self):
+        self.__conn.close()
+
+
+def create_store(target=None):
+    # CHECKPOINT_DB is "postgres" or "sqlite:///path/to/file.db". without it
+    # postgres is used when DATABASE_HOST is set, otherwise there's no store
+    target = target or os.getenv("CHECKPOINT_DB")
+    if target is None:
+        target = "postgres" if os.getenv("DATABASE_HOST") else None
+    if target is None:
+        return None
+    if target == "postgres":
+        return PostgresCheckpointStore()
+    if target.startswith("sqlite:///"):
+        return SQLiteCheckpointStore(target[len("sqlite:///") :])
+    raise ValueError(f"unknown CHECKPOINT_DB {target!r}")
+
+
+_store = None
+_store_created = False
+_store_lock = threading.Lock()
+
+
+def get_checkpoints():
+    # shared store, or None when no database is configured
+    global _store, _store_created
+    if not _store_created:
+        with _store_lock:
+            if not _store_created:
+                _store = create_store()
+                _store_created = True
+    return _store
@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+from fetcher import Fetcher
+from http_session import get_session
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sitemaps.json")
+
+# what a real sitemap/feed can come back as, anything else (mostly html soft
+# 404 pages) doesn't count as a hit
+FEED_CONTENT_TYPES = ("xml", "gzip", "text/plain", "rss", "atom", "octet-stream")
+
+
+class SitemapDiscovery:
+    """finds the sitemap (or feed) of a site and remembers it per domain.
+
+    robots.txt `Sitemap:` lines and every path listed in sitemaps.json are
+    probed at the same time; robots.txt wins, otherwise the first path in
+    config order that answered. the answer (hit or miss) is cached on disk
+    for `ttl` seconds so later runs don't probe again.
+    """
+
+    def __init__(self, session=None, config_path=None, cache_path=None, ttl=None):
+        self.session = session or get_session()
+        self.timeout = float(os.getenv("SITEMAP_PROBE_TIMEOUT", "10"))
+        self.ttl = ttl or float(os.getenv("SITEMAP_DISCOVERY_TTL", str(24 * 3600)))
+        self.cache_path = cache_path or os.getenv(
+            "SITEMAP_DISCOVERY_CACHE",
+            os.path.join(os.getcwd(), ".cache", "sitemap_discovery.json"),
+        )
+        with open(config_path or DEFAULT_CONFIG, "r", encoding="utf-8") as file:
+            self.paths = json.load(file)["sitemap_types"]
+        self.fetcher = Fetcher(per_host=len(self.paths) + 1)
+        self.__lock = threading.Lock()
+
+    def __load_cache(self):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def __save_cache(self, cache):
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.cache_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(cache, file, indent=2)
+        os.replace(temp_path, self.cache_path)
+
+    def __robots_sitemaps(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        sitemaps = [
+            line.split(":", 1)[1].strip()
+            for line in response.text.splitlines()
+            if line.lower().startswith("sitemap:")
+        ]
+        return sitemaps or None
+
+    def __probe(self, url):
+        if url.endswith("/robots.txt"):
+            return self.__robots_sitemaps(url)
+        response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        if response.status_code == 405:
+            # some servers don't do HEAD, only read the headers of a GET
+            response = self.session.get(url, stream=True, timeout=self.timeout)
+            response.close()
+        if response.status_code != 200:
+            return None
+        content_type = response.headers.get("Content-Type", "").lower()
+        if not any(kind in content_type for kind in FEED_CONTENT_TYPES):
+            return None
+        return response.url
+
+    def __probe_all(self, root):
+        candidates = [urljoin(root, "/robots.txt")] + [urljoin(root, path) for path in self.paths]
+        # failed probes are just misses, nothing to report
+        results = self.fetcher.map(self.__probe, candidates)
+        robots, probes = results[0], results[1:]
+        if robots:
+            return robots[0]
+        return next((found for found in probes if found), None)
+
+    def discover(self, base_url, refresh=False):
+        # returns the sitemap url for base_url's domain, or None
+        parts = urlsplit(base_url)
+        domain = parts.netloc
+        with self.__lock:
+            cache = self.__load_cache()
+            entry = cache.get(domain)
+            if entry and not refresh and time.time() - entry["found_at"] < self.ttl:
+                return entry["url"]
+
+        found = self.__probe_all(f"{parts.scheme}://{domain}/")
+
+        with self.__lock:
+            cache = self.__load_cache()
+            cache[domain] = {"url": found, "found_at": time.time()}
+            self.__save_cache(cache)
+        return found
+
+
+_discovery = None
+_discovery_lock = threading.Lock()
+
+
+def get_discovery():
+    global _discovery
+    if _discovery is None:
+        with _discovery_lock:
+            if _discovery is None:
+                _discovery = SitemapDiscovery()
+    return _discovery
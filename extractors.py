@@ -0,0 +1,69 @@
+import os
+
+# characters the scrapers have always stripped off the end of each paragraph
+# (substack/ap footers like "No posts Ready for more?")
+PARAGRAPH_STRIP = "  No posts Ready for more?"
+
+
+def _join_paragraphs(texts):
+    return " ".join(text.rstrip(PARAGRAPH_STRIP) for text in texts if text is not None)
+
+
+def extract_with_lxml(html):
+    # C parser, and we only walk <title> and <p> without building a python tree.
+    # it follows the html5 rules, so a <ul>, <table>, <div> or another block
+    # element inside a <p> closes the paragraph and the text in and after it
+    # is left out ("<p>A<ul><li>b</li></ul>C</p>" gives "A", soup "AbC").
+    # opt-in until it matches what soup has always extracted.
+    import lxml.etree
+    import lxml.html
+
+    if not html or not html.strip():
+        return None, ""
+    try:
+        root = lxml.html.fromstring(html)
+    except ValueError:
+        # str input with an <?xml encoding=...?> declaration has to go in as bytes
+        root = lxml.html.fromstring(html.encode("utf-8"))
+    except lxml.etree.ParserError:
+        return None, ""
+    title = root.find(".//title")
+    title = title.text_content() if title is not None else None
+    content = _join_paragraphs(para.text_content() for para in root.iter("p"))
+    return title, content
+
+
+def extract_with_soup(html):
+    # pure python fallback, parses only the tags we need
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer(["title", "p"]))
+    title = soup.find("title")
+    title = title.get_text() if title is not None else None
+    content = _join_paragraphs(para.text for para in soup.find_all("p"))
+    return title, content
+
+
+BACKENDS = {
+    "lxml": extract_with_lxml,
+    "soup": extract_with_soup,
+}
+
+
+def get_extractor(name=None):
+    # HTML_EXTRACTOR picks the backend, soup by default. lxml falls back to
+    # soup when it isn't installed
+    name = name or os.getenv("HTML_EXTRACTOR", "soup")
+    if name not in BACKENDS:
+        raise ValueError(f"unknown HTML_EXTRACTOR {name!r}, pick one of {sorted(BACKENDS)}")
+    if name == "lxml":
+        try:
+            import lxml.html  # noqa: F401
+        except ImportError:
+            return BACKENDS["soup"]
+    return BACKENDS[name]
+
+
+def extract_article(html, backend=None):
+    # returns (title text or None, paragraph text joined by spaces)
+    return get_extractor(backend)(html)
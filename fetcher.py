@@ -0,0 +1,101 @@
+import heapq
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+
+from instrumentation import submit
+
+
+class Fetcher:
+    """fetches a list of urls concurrently, bounded overall and per host.
+
+    results come back in the same order as the urls that were passed in.
+    request errors that ran out of retries come back as None (and go to
+    on_error when one is given), anything else func raises is raised again
+    unless on_error takes care of it. when a retry policy is given, failed
+    urls are put back on a timer instead of sleeping inside a worker, so the
+    other urls keep going while one of them waits out its backoff.
+    """
+
+    def __init__(self, max_workers=None, per_host=None, retry_policy=None):
+        self.max_workers = max_workers or int(os.getenv("FETCH_WORKERS", "8"))
+        self.per_host = per_host or int(os.getenv("FETCH_PER_HOST", "4"))
+        self.retry_policy = retry_policy
+
+    @staticmethod
+    def __host(url):
+        return urlsplit(url).netloc
+
+    def __gave_up(self, exception):
+        # True for request errors that were (or would have been) retried
+        if self.retry_policy is not None:
+            return self.retry_policy.is_retryable(exception)
+        return isinstance(exception, requests.exceptions.RequestException)
+
+    def map(self, func, urls, on_error=None):
+        # func(url) is called from worker threads, on_error(url, exception) from
+        # the calling thread once func has failed for good
+        urls = list(urls)
+        results = [None] * len(urls)
+        if len(urls) == 0:
+            return results
+
+        pending = deque(range(len(urls)))
+        attempts = [0] * len(urls)
+        waiting = []  # heap of (ready_at, index) for urls backing off
+        in_flight = {}
+        busy_hosts = Counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or in_flight or waiting:
+                now = time.monotonic()
+                while waiting and waiting[0][0] <= now:
+                    pending.append(heapq.heappop(waiting)[1])
+
+                # hand out work while there are free workers, skipping hosts
+                # that are already at their limit (they get picked up later)
+                deferred = deque()
+                while pending and len(in_flight) < self.max_workers:
+                    index = pending.popleft()
+                    host = self.__host(urls[index])
+                    if busy_hosts[host] >= self.per_host:
+                        deferred.append(index)
+                        continue
+                    busy_hosts[host] += 1
+                    in_flight[submit(executor, func, urls[index])] = index
+                deferred.extend(pending)
+                pending = deferred
+
+                if not in_flight:
+                    # nothing running, just sleep until the next retry is due
+                    time.sleep(max(waiting[0][0] - time.monotonic(), 0))
+                    continue
+                timeout = None
+                if waiting:
+                    timeout = max(waiting[0][0] - time.monotonic(), 0)
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    busy_hosts[self.__host(urls[index])] -= 1
+                    try:
+                        results[index] = future.result()
+                    except Exception as exception:
+                        delay = None
+                        if self.retry_policy is not None:
+                            delay = self.retry_policy.next_delay(
+                                attempts[index], exception
+                            )
+                        if delay is not None:
+                            attempts[index] += 1
+                            heapq.heappush(waiting, (time.monotonic() + delay, index))
+                        elif on_error is not None:
+                            on_error(urls[index], exception)
+                        elif not self.__gave_up(exception):
+                            # a bug or a non-retryable error, not a missing page
+                            raise exception
+
+        return results
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+class FingerprintStore:
+    """remembers a hash of every article's normalized content, by url.
+
+    backed by a single sqlite file (FINGERPRINT_DB), one row per url keyed on
+    the url itself, so lookups stay O(1)-ish (b-tree) at hundreds of
+    thousands of urls. rows that haven't been seen for max_age are pruned.
+
+    fingerprints computed for a source are only staged until commit(), so an
+    article isn't considered seen before its row was actually written out.
+    """
+
+    def __init__(self, path=None, max_age=None):
+        self.path = path or os.getenv(
+            "FINGERPRINT_DB", os.path.join(os.getcwd(), ".cache", "fingerprints.sqlite3")
+        )
+        self.max_age = max_age or float(os.getenv("FINGERPRINT_MAX_AGE", str(180 * 24 * 3600)))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.__lock = threading.Lock()
+        self.__staged = {}  # source -> [(url, digest, last_seen)]
+        self.__conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.__conn.execute("PRAGMA journal_mode=WAL")
+        self.__conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                url TEXT PRIMARY KEY,
+                digest BLOB NOT NULL,
+                last_seen REAL NOT NULL
+            ) WITHOUT ROWID
+            """
+        )
+        self.__conn.commit()
+
+    @staticmethod
+    def normalize(content):
+        # whitespace differences alone don't count as a change
+        return " ".join(str(content).split())
+
+    @classmethod
+    def digest(cls, content):
+        return hashlib.blake2b(
+            cls.normalize(content).encode("utf-8"), digest_size=16
+        ).digest()
+
+    def __known_digests(self, urls):
+        known = {}
+        # sqlite caps the number of bound parameters per statement
+        for start in range(0, len(urls), 500):
+            chunk = urls[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.__conn.execute(
+                f"SELECT url, digest FROM fingerprints WHERE url IN ({placeholders})",
+                chunk,
+            )
+            known.update(rows)
+        return known
+
+    def __store(self, rows):
+        self.__conn.executemany(
+            """
+            INSERT INTO fingerprints (url, digest, last_seen) VALUES (?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                digest = excluded.digest, last_seen = excluded.last_seen
+            """,
+            rows,
+        )
+        self.__conn.execute(
+            "DELETE FROM fingerprints WHERE last_seen < ?", (time.time() - self.max_age,)
+        )
+        self.__conn.commit()
+
+    def changed(self, urls, contents, source=None):
+        # returns one bool per url, True when it's new or its content changed,
+        # and remembers the new fingerprints (staged under source, if given)
+        urls = list(urls)
+        digests = [self.digest(content) for content in contents]
+        now = time.time()
+        rows = [(url, digest, now) for url, digest in zip(urls, digests)]
+        with self.__lock:
+            known = self.__known_digests(urls)
+            flags = [known.get(url) != digest for url, digest in zip(urls, digests)]
+            if source is not None:
+                self.__staged.setdefault(source, []).extend(rows)
+            else:
+                self.__store(rows)
+        return flags
+
+    def drop_unchanged(self, data_frame, source=None):
+        # keeps only the rows whose content is new or different from last time
+        if data_frame is None or data_frame.shape[0] == 0:
+            return data_frame
+        flags = self.changed(
+            data_frame["url"].tolist(), data_frame["content"].tolist(), source=source
+        )
+        return data_frame[flags].reset_index(drop=True)
+
+    def commit(self, sources=None):
+        # stores what was staged for these sources (all of them by default)
+        with self.__lock:
+            names = list(self.__staged) if sources is None else [
+                name for name in sources if name in self.__staged
+            ]
+            rows = [row for name in names for row in self.__staged.pop(name)]
+            if rows:
+                self.__store(rows)
+
+    def discard(self, sources=None):
+        with self.__lock:
+            if sources is None:
+                self.__staged.clear()
+            for name in sources or ():
+                self.__staged.pop(name, None)
+
+    def close(self):
+        with self.__lock:
+            self.__conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_fingerprints():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FingerprintStore()
+    return _store
@@ -1,77 +1,94 @@
-import os
 import requests
-import json
-import pandas as pd
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta, timezone
-import time
-from dateutil.parser import parse
 import random
-
-try:
-    from dotenv import load_dotenv
-
-    load_dotenv()
-except ImportError:
-    pass
-
-
-class FlyWheel:
-    #__INTERNAL_ACTIVITY_WHOOK_URL = os.getenv("INTERNAL_ACTIVITY_WHOOK_URL")
-    __BRAIN_DAO_ALARMS_WHOOK_URL = os.getenv("WEBHOOK_URL")
+import logging
+
+import bootstrap
+from discovery import get_discovery
+from fetcher import Fetcher
+from fingerprints import get_fingerprints
+from frontier import get_frontier
+from http_cache import NOT_MODIFIED
+from http_session import stats
+from instrumentation import metrics
+from notifier import get_notifier
+from pages import get_pages
+from records import RecordBuilder, select_since
+from registry import Scraper
+from retry import RetryPolicy
+from sitemap import iter_sitemap
+
+class FlyWheel(Scraper):
+    name = "flywheel"
 
     def __init__(self):
         self.URL = "https://flywheeldefi.com/"
         self.SITEMAP_URL = "https://flywheeldefi.com/sitemap.xml"
+        self.logger = logging.getLogger(__name__)
+        self.pages = get_pages()
+        self.retry_policy = RetryPolicy.from_env()
+        self.notifier = get_notifier()
+        self.fingerprints = get_fingerprints()
+        self.fetcher = Fetcher(retry_policy=self.retry_policy)
+        # finds the sitemap from robots.txt / sitemaps.json, cached per domain
+        self.discovery = get_discovery()
+        self.frontier = get_frontier()
 
     """probably this part of code is not necessary since we know sitemap url, if it's chaging in dynamic sense
         may be then for finding where will he helpful
     """
 
-    def __scrape_content(self, urls, source="Flywheel"):
-        data_frame = pd.DataFrame(columns=["source", "url", "title", "content"])
-        for current_url in urls:
-            html = self.__send_request(current_url)
-            if html is None:
-                self.__log_to_discord(
-                    f"⛔️ Bad URL for making request - {current_url} ⛔️"
-                )
-                continue
-
-            current_title = html.find("title")
-            current_content = html.find_all("p")
-            current_content = [
-                para.text.rstrip("  No posts Ready for more?")
-                for para in current_content
-                if para.text is not None
-            ]
-            current_content = " ".join(current_content)
-            if len(current_content) == 0:
-                self.__log_to_discord(f"⛔️ No content found at: {current_url}\n 😿")
-                continue
-            else:
-                new_data_frame = pd.DataFrame(
-                    {
-                        "source": [source],
-                        "url": [current_url],
-                        "title": [current_title],
-                        "content": [current_content],
-                    }
-                )
-
-                data_frame = pd.concat(
-                    [data_frame, new_data_frame], axis=0, ignore_index=True
-                )
+    def __sitemap_url(self):
+        # SITEMAP_URL is the fallback when discovery doesn't turn anything up
+        return self.discovery.discover(self.URL) or self.SITEMAP_URL
 
-        return data_frame
+    def __scrape_content(self, urls, source="Flywheel"):
+        # urls go through the frontier, so pages an interrupted run didn't get
+        # to are picked up here and the ones it did aren't downloaded again
+        self.frontier.add(self.name, urls)
+        todo = list(self.frontier.claim(self.name))
+        failed = []
+        self.fetcher.map(
+            lambda url: self.__scrape_page(url, source),
+            todo,
+            on_error=lambda url, exception: self.__skip_page(url, exception, failed),
+        )
+        if failed:
+            raise RuntimeError(
+                f"{len(failed)} pages couldn't be downloaded, they are retried next run"
+            ) from failed[-1]
+        records = RecordBuilder()
+        records.extend(self.frontier.records(self.name))
+        return records.to_frame()
+
+    def __scrape_page(self, current_url, source):
+        current_title, current_content = self.pages.article(current_url)
+        if len(current_content) == 0:
+            self.__log_to_discord(f"⛔️ No content found at: {current_url}\n 😿")
+            self.frontier.finish(self.name, [(current_url, None)])
+        else:
+            # kept right away, a later crash doesn't lose it
+            record = [source, current_url, current_title, current_content]
+            self.frontier.finish(self.name, [(current_url, record)])
+
+    def __skip_page(self, current_url, exception, failed):
+        self.__log_to_discord(
+            f"❌ problem with scraping [{current_url}]: {exception} No retries left. Check URL passed! ❌"
+        )
+        if self.retry_policy.is_permanent(exception):
+            # the page is gone, there's nothing to come back for
+            self.frontier.finish(self.name, [(current_url, None)])
+        else:
+            # stays in the frontier and fails the run, so it's downloaded
+            # next time instead of dropped
+            failed.append(exception)
 
     def __scrape_updated_urls(self, cut_off_date):
-        # let it be since here we are parsing xml page
-
-        xml = self.__send_request(self.SITEMAP_URL, parser="xml")
-        if xml is not None:
-            url_set = xml.find_all("url")
-
+        sitemap = self.__send_request(self.__sitemap_url(), cached=True)
+        if sitemap is NOT_MODIFIED:
+            self.__log_to_discord("Flywheel sitemap unchanged since last run 💤", color=16753920)
+            return None
+        if sitemap is not None:
             """
             Ex: <url>
                 <loc>https://flywheeloutput.com/p/everything-you-need-to-know-about</loc>
@@ -79,42 +96,24 @@ class FlyWheel:
                 <changefreq>monthly</changefreq>
             </url>
             """
-            urls_with_dates = [
-                [
-                    datetime.fromisoformat(
-                        url_set_item.find("lastmod").string
-                    ).strftime("%Y-%m-%d"),
-                    url_set_item.find("loc").string,
-                ]
-                for url_set_item in url_set
-                if url_set_item.find("lastmod") is not None
-            ]
-
-            # most_recent_timestamp = self.__get_most_recent_timestamp()
-            # cut_off_date = most_recent_timestamp.date()
-            # cut_off_date = cut_off_date.strftime("%Y-%m-%d")
-            """
-            start_date = datetime(2023, 4, 1, tzinfo=timezone.utc)
-            end_date = datetime(2023, 5, 1, tzinfo=timezone.utc)
-
-            random_dt = self.__random_date(start_date, end_date)
-            random_dt_str = random_dt.strftime("%Y-%m-%d")
-            """
             self.__log_to_discord(
                 f"Scraped Flywheel last on: {cut_off_date} 🗓️",
                 color=16776960,
             )
-            cut_off_date = cut_off_date.date()
-            cut_off_date = cut_off_date.strftime("%Y-%m-%d")
-            to_be_scraped_urls = [
-                each_article[1]
-                for each_article in urls_with_dates
-                if parse(each_article[0]) > parse(cut_off_date)
-            ]
+            with metrics.timer("parse"):
+                entries = list(iter_sitemap(sitemap, fetch=self.__send_request))
+            # compared by calendar day, as written in the sitemap, in one go
+            to_be_scraped_urls = select_since(
+                [loc for loc, _ in entries],
+                [lastmod for _, lastmod in entries],
+                cut_off_date,
+                strict=True,
+                by_day=True,
+            )
 
             if to_be_scraped_urls is not None:
                 self.__log_to_discord(to_be_scraped_urls, color=16776960)  # yellow
-                return list(set(to_be_scraped_urls))
+                return to_be_scraped_urls
             else:
                 return None
         else:
@@ -127,28 +126,14 @@ class FlyWheel:
         return start + timedelta(seconds=random_second)
 
     def __scrape_all_urls(self):
-        xml = self.__send_request(self.SITEMAP_URL, parser="xml")
-        if xml is not None:
-            url_set = xml.find_all("url")
-            """
-            Ex: <url>
-                <loc>https://flywheeloutput.com/p/everything-you-need-to-know-about</loc>
-                <lastmod>2023-04-20</lastmod>
-                <changefreq>monthly</changefreq>
-            </url>
-            """
-            urls_with_dates = [
-                [
-                    datetime.fromisoformat(
-                        url_set_item.find("lastmod").string
-                    ).strftime("%Y-%m-%d"),
-                    url_set_item.find("loc").string,
+        sitemap = self.__send_request(self.__sitemap_url())
+        if sitemap is not None:
+            with metrics.timer("parse"):
+                to_be_scraped_urls = [
+                    loc
+                    for loc, lastmod in iter_sitemap(sitemap, fetch=self.__send_request)
+                    if lastmod is not None
                 ]
-                for url_set_item in url_set
-                if url_set_item.find("lastmod") is not None
-            ]
-
-            to_be_scraped_urls = [each_article[1] for each_article in urls_with_dates]
             if to_be_scraped_urls is not None:
                 self.__log_to_discord(to_be_scraped_urls, color=16776960)
                 return list(set(to_be_scraped_urls))
@@ -157,50 +142,27 @@ class FlyWheel:
         else:
             return None
 
-    def __send_request(self, url, retries=3, parser="html.parser"):
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            return BeautifulSoup(response.text, parser)
-        except requests.exceptions.RequestException as exception:
-            if retries > 0:
-                # logging.debug(f'Error: While scraping {url} {exception}. Retrying in 5 seconds...')
-                time.sleep(5)
-                return self.__send_request(url, retries - 1)
-            else:
-                """self.logger.setLevel(logging.WARNING)
-                self.logger.warning(
-                    f"Problem with scraping [{url}]: {exception} After 3 retries, No retries left. Check URL passed!"
-                )"""
-                self.__log_to_discord(
-                    f"❌ problem with scraping [{url}]: {exception} After 3 retries, No retries left. Check URL passed! ❌"
-                )
-                return None
+    def __fetch(self, url, cached=False):
+        # single attempt, retrying is up to the caller's retry policy
+        response = self.pages.get_cached(url) if cached else self.pages.get(url)
+        if response is NOT_MODIFIED:
+            return NOT_MODIFIED
+        return response.content
 
-    def __log_to_discord(self, message, color=16711680, retries=3):  # by-default red
-        payload = self.__create_payload(message, color)
+    def __send_request(self, url, cached=False):
+        # raw body of the page (sitemaps go straight to the streaming parser),
+        # cached requests return NOT_MODIFIED when it's the same as last run
         try:
-            response = requests.post(
-                self.__BRAIN_DAO_ALARMS_WHOOK_URL,
-                data=json.dumps(payload),
-                headers={"Content-Type": "application/json"},
-            )
-            response.raise_for_status()
+            return self.retry_policy.call(self.__fetch, url, cached=cached)
         except requests.exceptions.RequestException as exception:
-            if retries > 0:
-                # logging.debug(f'Error: While scraping {url} {exception}. Retrying in 5 seconds...')
-                time.sleep(5)
-                return self.__log_to_discord(message, retries - 1)
-            else:
-                """self.logger.setLevel(logging.WARNING)
-                self.logger.warning(
-                    f"❌ Error Logging to discord: {exception} After 3 retries, No retries left. Check/Debug URL passed! ❌"
-                )"""
-                # logs to local file after 3 failed calls
-                self.logger.error(
-                    f"❌ Error Logging to discord: {exception} After 3 retries, No retries left. Check/Debug URL passed! ❌"
-                )
-                return None
+            self.__log_to_discord(
+                f"❌ problem with scraping [{url}]: {exception} No retries left. Check URL passed! ❌"
+            )
+            return None
+
+    def __log_to_discord(self, message, color=16711680):  # by-default red
+        # queued, the shared sink batches and delivers in the background
+        self.notifier.send(self.__create_payload(message, color))
 
     def __create_payload(self, message, color=16711680):
         if isinstance(message, list):
@@ -229,19 +191,28 @@ class FlyWheel:
                 ],
             }
 
-    def scrape(self, cut_off_date):
+    def scrape(self, cut_off_date=None):
+        self.retry_policy.start()
+        if cut_off_date is None:
+            # testing with a random date until the cut-off comes from the DB
+            start_date = datetime(2023, 4, 1, tzinfo=timezone.utc)
+            end_date = datetime(2023, 5, 1, tzinfo=timezone.utc)
+            cut_off_date = self.random_date(start_date, end_date)
         try:
             self.__log_to_discord("🏁 Initiating Flywheel Scraper 🔧", color=65280)
             # better send cuttof date as string from db
             # i guess it's done like this since we dk how each scraper is expecting it's date format to be in
             updated_urls = self.__scrape_updated_urls(cut_off_date)
-            if updated_urls is None:
+            # an interrupted run can leave pages behind even when nothing is new
+            if updated_urls is None and not self.frontier.counts(self.name):
                 self.__log_to_discord(
                     "🚫 No pages in FLywheel substack are found to have updates! 🚫"
                 )
                 return None
             else:
-                df = self.__scrape_content(updated_urls)
+                df = self.__scrape_content(updated_urls or [])
+                # drop articles whose text is the same as the last time we saw them
+                df = self.fingerprints.drop_unchanged(df, source=self.name)
                 if df is not None:
                     self.__log_to_discord(
                         f" Total pages scraped = {df.shape[0]} 🚀",
@@ -258,17 +229,23 @@ class FlyWheel:
         except Exception as e:
             self.__log_to_discord(f"❌ Error during Flywheel Scraper ❌\n{e}")
             print(f"❌ Error during Flywheel Scraper ❌\n{e}")
+            # the sitemap's urls may not have reached the frontier yet, read it
+            # in full next run instead of getting a 304
+            self.pages.http_cache.invalidate(self.__sitemap_url())
+            # the runner marks the source failed, so nothing is committed and
+            # the frontier is kept for the next run
+            raise
 
         finally:
-            self.__log_to_discord(
-                "Scraping Successful ✅\n\nExit Flywheel Scraping 🏁", color=65280
-            )
+            self.__log_to_discord("Exit Flywheel Scraping 🏁", color=65280)
 
 
-obj = FlyWheel()
-start_date = datetime(2023, 4, 1, tzinfo=timezone.utc)
-end_date = datetime(2023, 5, 1, tzinfo=timezone.utc)
+if __name__ == "__main__":
+    bootstrap.load_env()
+    obj = FlyWheel()
+    print(obj.scrape())
+    # the output is out, move the checkpoints forward
+    import runner
 
-random_dt = obj.random_date(start_date, end_date)
-random_dt_str = random_dt.strftime("%Y-%m-%d")
-print(obj.scrape(random_dt))
+    runner.commit_sources([obj.name])
+    print(f"http connections: {stats.as_dict()}")
@@ -0,0 +1,144 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+
+
+class Frontier:
+    """what each source still has to scrape, kept on disk across runs.
+
+    listed urls start out pending, are claimed (in_progress) when a run
+    starts on them and become done together with the scraped record. rows
+    stay until complete() is called, which the runner only does once the
+    output has been written, so a run that dies half way is resumed by the
+    next one: in_progress goes back to pending and done records are reused
+    instead of downloaded again. backed by a sqlite file (FRONTIER_DB).
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv(
+            "FRONTIER_DB", os.path.join(os.getcwd(), ".cache", "frontier.sqlite3")
+        )
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.__lock = threading.Lock()
+        self.__conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.__conn.execute("PRAGMA journal_mode=WAL")
+        self.__conn.execute("PRAGMA synchronous=NORMAL")
+        self.__conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS frontier (
+                source TEXT NOT NULL,
+                url TEXT NOT NULL,
+                state TEXT NOT NULL,
+                meta TEXT,
+                record TEXT,
+                updated REAL NOT NULL,
+                UNIQUE (source, url)
+            )
+            """
+        )
+        self.__conn.execute(
+            "CREATE INDEX IF NOT EXISTS frontier_state ON frontier (source, state)"
+        )
+        self.__conn.commit()
+
+    def add(self, source, urls):
+        # urls is a list, or a dict of url -> meta (anything json can store).
+        # urls the frontier already has keep their state
+        if not isinstance(urls, dict):
+            urls = dict.fromkeys(urls)
+        now = time.time()
+        with self.__lock:
+            self.__conn.executemany(
+                "INSERT OR IGNORE INTO frontier (source, url, state, meta, updated) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (source, url, PENDING, None if meta is None else json.dumps(meta), now)
+                    for url, meta in urls.items()
+                ],
+            )
+            self.__conn.commit()
+
+    def claim(self, source):
+        """marks everything pending as in_progress and returns it as
+        url -> meta, in the order it was added. whatever an interrupted run
+        had in progress is included.
+        """
+        with self.__lock:
+            self.__conn.execute(
+                "UPDATE frontier SET state = ? WHERE source = ? AND state = ?",
+                (PENDING, source, IN_PROGRESS),
+            )
+            rows = self.__conn.execute(
+                "SELECT url, meta FROM frontier WHERE source = ? AND state = ? ORDER BY rowid",
+                (source, PENDING),
+            ).fetchall()
+            self.__conn.execute(
+                "UPDATE frontier SET state = ?, updated = ? WHERE source = ? AND state = ?",
+                (IN_PROGRESS, time.time(), source, PENDING),
+            )
+            self.__conn.commit()
+        return {url: None if meta is None else json.loads(meta) for url, meta in rows}
+
+    def finish(self, source, items):
+        # items are (url, record) pairs, record being the row's values or
+        # None when there was nothing to keep (failed page, no content)
+        now = time.time()
+        with self.__lock:
+            self.__conn.executemany(
+                "UPDATE frontier SET state = ?, record = ?, updated = ? WHERE source = ? AND url = ?",
+                [
+                    (DONE, None if record is None else json.dumps(record), now, source, url)
+                    for url, record in items
+                ],
+            )
+            self.__conn.commit()
+
+    def records(self, source):
+        # every record scraped since the last complete(), this run's and any
+        # interrupted run's
+        with self.__lock:
+            rows = self.__conn.execute(
+                "SELECT record FROM frontier WHERE source = ? AND state = ? AND record IS NOT NULL ORDER BY rowid",
+                (source, DONE),
+            ).fetchall()
+        return [json.loads(record) for (record,) in rows]
+
+    def counts(self, source):
+        with self.__lock:
+            rows = self.__conn.execute(
+                "SELECT state, COUNT(*) FROM frontier WHERE source = ? GROUP BY state",
+                (source,),
+            ).fetchall()
+        return dict(rows)
+
+    def complete(self, source):
+        # the output is written, done urls won't be needed again
+        with self.__lock:
+            self.__conn.execute(
+                "DELETE FROM frontier WHERE source = ? AND state = ?", (source, DONE)
+            )
+            self.__conn.commit()
+
+    def close(self):
+        with self.__lock:
+            self.__conn.close()
+
+
+_frontier = None
+_frontier_lock = threading.Lock()
+
+
+def get_frontier():
+    global _frontier
+    if _frontier is None:
+        with _frontier_lock:
+            if _frontier is None:
+                _frontier = Frontier()
+    return _frontier
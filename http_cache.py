@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# returned instead of a page when the server says it hasn't changed (304)
+NOT_MODIFIED = object()
+
+
+class CachedResponse:
+    def __init__(self, content, encoding=None, not_modified=False):
+        self.content = content
+        self.encoding = encoding or "utf-8"
+        self.not_modified = not_modified
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+
+class ResponseCache:
+    """on-disk cache of GET responses keyed by url, revalidated with
+    If-None-Match / If-Modified-Since.
+
+    each url gets a `<sha256>.json` file with its validators and a
+    `<sha256>.body` file with the raw body. entries older than max_age are
+    dropped, then the least recently used ones until the cache fits in
+    max_bytes.
+    """
+
+    def __init__(self, directory=None, max_bytes=None, max_age=None):
+        self.directory = directory or os.getenv(
+            "HTTP_CACHE_DIR", os.path.join(os.getcwd(), ".cache", "http")
+        )
+        self.max_bytes = max_bytes or int(os.getenv("HTTP_CACHE_MAX_BYTES", str(50 * 2**20)))
+        self.max_age = max_age or float(os.getenv("HTTP_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+        self.__lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + ".json", base + ".body"
+
+    @staticmethod
+    def __write(path, data):
+        # write-then-rename so a crash never leaves half a file behind
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+    def __load(self, url):
+        meta_path, body_path = self.__paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            with open(body_path, "rb") as file:
+                body = file.read()
+        except (OSError, ValueError):
+            return None, None
+        if meta.get("url") != url or time.time() - meta["stored_at"] > self.max_age:
+            return None, None
+        return meta, body
+
+    def __store(self, url, response):
+        meta_path, body_path = self.__paths(url)
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "encoding": response.encoding,
+            "stored_at": time.time(),
+        }
+        self.__write(body_path, response.content)
+        self.__write(meta_path, json.dumps(meta).encode("utf-8"))
+
+    def get(self, session, url, **kwargs):
+        meta, body = self.__load(url)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = session.get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and meta is not None:
+            # bump the timestamps so the entry counts as recently used
+            meta["stored_at"] = time.time()
+            self.__write(self.__paths(url)[0], json.dumps(meta).encode("utf-8"))
+            return CachedResponse(body, meta.get("encoding"), not_modified=True)
+
+        response.raise_for_status()
+        if response.headers.get("ETag") or response.headers.get("Last-Modified"):
+            self.__store(url, response)
+            self.evict()
+        return CachedResponse(response.content, response.encoding)
+
+    def invalidate(self, url):
+        # forgets url, so its next request is a plain GET again. for pages a
+        # failed run read but never got to use
+        self.__remove(*self.__paths(url))
+
+    def evict(self):
+        with self.__lock:
+            now = time.time()
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"):
+                    continue
+                meta_path = os.path.join(self.directory, name)
+                body_path = meta_path[: -len(".json")] + ".body"
+                try:
+                    stat = os.stat(meta_path)
+                    size = stat.st_size + os.path.getsize(body_path)
+                except OSError:
+                    size = 0
+                    stat = None
+                if stat is None or now - stat.st_mtime > self.max_age:
+                    self.__remove(meta_path, body_path)
+                    continue
+                entries.append((stat.st_mtime, size, meta_path, body_path))
+
+            total = sum(entry[1] for entry in entries)
+            for _, size, meta_path, body_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self.__remove(meta_path, body_path)
+                total -= size
+
+    @staticmethod
+    def __remove(*paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
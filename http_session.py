@@ -0,0 +1,161 @@
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from instrumentation import metrics
+from rate_limit import RateLimiter
+
+# hosts we hit over and over again get their own adapter (and pool sizes)
+HOST_POOL_SIZES = {
+    "https://apnews.com": 8,
+    "https://flywheeldefi.com": 8,
+    "https://graph.everipedia.org": 4,
+    "https://discord.com": 2,
+}
+
+
+class ConnectionStats:
+    """counts how many connections were opened and how many requests went out.
+
+    every request that didn't need a fresh connection reused a pooled one.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.opened = 0
+        self.requests = 0
+
+    def count_open(self):
+        with self.__lock:
+            self.opened += 1
+
+    def count_request(self):
+        with self.__lock:
+            self.requests += 1
+
+    @property
+    def reused(self):
+        return max(self.requests - self.opened, 0)
+
+    def as_dict(self):
+        return {"opened": self.opened, "reused": self.reused, "requests": self.requests}
+
+
+stats = ConnectionStats()
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        stats.count_open()
+        return super().connect()
+
+    def request(self, *args, **kwargs):
+        stats.count_request()
+        return super().request(*args, **kwargs)
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        stats.count_open()
+        return super().connect()
+
+    def request(self, *args, **kwargs):
+        stats.count_request()
+        return super().request(*args, **kwargs)
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    # keep-alive adapter whose pools report into the module level stats
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+class PoliteSession(requests.Session):
+    # every request waits for its host's rate limiter first and reports back
+    # how it was answered, so 429/503 slow the host down. requests that don't
+    # pass a timeout get HTTP_TIMEOUT (seconds), a hung socket becomes a
+    # retryable error instead of blocking its scraper for good
+    def __init__(self, rate_limiter=None, timeout=None):
+        super().__init__()
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout or float(os.getenv("HTTP_TIMEOUT", "30"))
+
+    def __fetch_robots(self, url):
+        return super().request("GET", url, timeout=10)
+
+    def request(self, method, url, *args, **kwargs):
+        host = urlsplit(url).netloc
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        if self.rate_limiter is not None:
+            waited = self.rate_limiter.wait(url, self.__fetch_robots)
+            if waited:
+                metrics.observe("rate_limit", waited, host=host)
+        try:
+            with metrics.timer("fetch", host=host):
+                response = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException:
+            metrics.count("http_errors", host=host)
+            raise
+        metrics.count("http_requests", host=host, status=response.status_code)
+        if self.rate_limiter is not None:
+            self.rate_limiter.observe(url, response)
+        return response
+
+
+def create_session(
+    pool_connections=None, pool_maxsize=None, host_pool_sizes=None, rate_limiter=None
+):
+    pool_connections = pool_connections or int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+    pool_maxsize = pool_maxsize or int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+    if host_pool_sizes is None:
+        host_pool_sizes = HOST_POOL_SIZES
+    if rate_limiter is None and os.getenv("RATE_LIMIT", "1") != "0":
+        rate_limiter = RateLimiter()
+
+    session = PoliteSession(rate_limiter)
+    default_adapter = PooledAdapter(
+        pool_connections=pool_connections, pool_maxsize=pool_maxsize
+    )
+    session.mount("http://", default_adapter)
+    session.mount("https://", default_adapter)
+    # requests picks the longest matching prefix, so these win over the defaults
+    for prefix, size in host_pool_sizes.items():
+        session.mount(prefix, PooledAdapter(pool_connections=1, pool_maxsize=size))
+    if os.getenv("HTTP_REPLAY"):
+        # record/replay fixtures for offline runs and benchmarks
+        import replay
+
+        replay.install(session)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    # one session shared by every scraper (and every thread) in the process
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
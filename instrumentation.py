@@ -0,0 +1,186 @@
+"""timers, counters and latency histograms for every scrape run.
+
+    with metrics.timer("parse"):
+        ...
+    metrics.count("http_requests", host="apnews.com", status=200)
+
+the source label comes from the `with source("ap_news"):` block the work
+runs under (the runner sets it per scraper, Fetcher and Paginator carry it
+into their worker threads), the host label is given where it's known.
+"""
+import contextvars
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# stages a run's wall-clock time is broken down into
+STAGES = (
+    "scrape",
+    "rate_limit",
+    "fetch",
+    "parse",
+    "extract",
+    "dataframe",
+    "checkpoint",
+    "notify",
+    "sink",
+)
+
+_current_source = contextvars.ContextVar("source", default=None)
+
+
+@contextmanager
+def source(name):
+    # labels everything recorded inside the block with this source
+    token = _current_source.set(name)
+    try:
+        yield
+    finally:
+        _current_source.reset(token)
+
+
+def current_source():
+    return _current_source.get()
+
+
+def submit(executor, func, *args, **kwargs):
+    # executor.submit that keeps the caller's source label in the worker thread
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+class Histogram:
+    """latency samples with count/sum and nearest-rank percentiles.
+
+    at most `max_samples` are kept (reservoir sampling beyond that), count
+    and sum stay exact.
+    """
+
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self.samples = []
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        if len(self.samples) < self.max_samples:
+            self.samples.append(value)
+        else:
+            index = random.randrange(self.count)
+            if index < self.max_samples:
+                self.samples[index] = value
+
+    def percentile(self, q):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        rank = max(int(round(q / 100.0 * len(ordered) + 0.5)) - 1, 0)
+        return ordered[min(rank, len(ordered) - 1)]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": round(self.percentile(50), 6),
+            "p95": round(self.percentile(95), 6),
+            "p99": round(self.percentile(99), 6),
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__timers = {}  # (stage, source, host) -> Histogram
+        self.__counters = {}  # (name, source, host, status) -> value
+
+    def observe(self, stage, seconds, host=None, source=None):
+        key = (stage, source or current_source(), host)
+        with self.__lock:
+            histogram = self.__timers.get(key)
+            if histogram is None:
+                histogram = self.__timers[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage, host=None, source=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, host=host, source=source)
+
+    def count(self, name, value=1, host=None, status=None, source=None):
+        key = (name, source or current_source(), host, status)
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def reset(self):
+        with self.__lock:
+            self.__timers.clear()
+            self.__counters.clear()
+
+    def as_dict(self):
+        with self.__lock:
+            timers = [
+                dict(stage=stage, source=source, host=host, **histogram.summary())
+                for (stage, source, host), histogram in self.__timers.items()
+            ]
+            counters = [
+                {"name": name, "source": source, "host": host, "status": status, "value": value}
+                for (name, source, host, status), value in self.__counters.items()
+            ]
+        return {"timers": timers, "counters": counters}
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2, default=str)
+
+    def to_prometheus(self, prefix="scraper"):
+        data = self.as_dict()
+        lines = [
+            f"# HELP {prefix}_stage_seconds time spent per stage",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for timer in data["timers"]:
+            labels = _labels(stage=timer["stage"], source=timer["source"], host=timer["host"])
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+                quantile_labels = _labels(
+                    stage=timer["stage"], source=timer["source"], host=timer["host"], quantile=quantile
+                )
+                lines.append(f"{prefix}_stage_seconds{quantile_labels} {timer[key]}")
+            lines.append(f"{prefix}_stage_seconds_sum{labels} {timer['sum']}")
+            lines.append(f"{prefix}_stage_seconds_count{labels} {timer['count']}")
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for counter in data["counters"]:
+            labels = _labels(
+                name=counter["name"],
+                source=counter["source"],
+                host=counter["host"],
+                status=counter["status"],
+            )
+            lines.append(f"{prefix}_events_total{labels} {counter['value']}")
+        return "\n".join(lines) + "\n"
+
+    def stage_totals(self):
+        # seconds per stage summed over sources and hosts, for the run report
+        totals = {}
+        with self.__lock:
+            for (stage, _, _), histogram in self.__timers.items():
+                totals[stage] = totals.get(stage, 0.0) + histogram.sum
+        return totals
+
+
+def _labels(**labels):
+    parts = []
+    for name, value in labels.items():
+        if value is None:
+            continue
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# process wide, like http_session.stats
+metrics = Metrics()
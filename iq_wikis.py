@@ -1,68 +1,43 @@
 import os
-import psycopg2
 import requests
 from datetime import timezone, datetime, timedelta
-import pandas as pd
-from dateutil import parser
-import time
-import json
 import random
+import json
 import logging
 
-
-try:
-    from dotenv import load_dotenv
-
-    load_dotenv()
-except ImportError:
-    pass
-
-
-class IQWiki:
-    @staticmethod
-    def __get_most_recent_timestamp():
-        indexed_at = None
-        conn = None
-        try:
-            conn = psycopg2.connect(
-                host=os.getenv("DATABASE_HOST"),
-                database="verceldb",
-                user="default",
-                password=os.getenv("DATABASE_PASSWORD"),
-            )
-            cursor = conn.cursor()
-
-            query = 'SELECT "indexedAt" FROM "Source" WHERE url = \'https://graph.everipedia.org/graphql\';'
-            cursor.execute(query)
-            result = cursor.fetchone()
-
-            if result is not None:
-                indexed_at = result[0]
-                print(f"indexedAt value for Source IQ Wiki: {indexed_at}")
-
-                current_time = datetime.now()
-                update_query = 'UPDATE "Source" SET "indexedAt" = %s WHERE url = \'https://graph.everipedia.org/graphql\';'
-                cursor.execute(update_query, (current_time,))
-                conn.commit()
-
-                print(
-                    "indexedAt value for Source IQ Wiki has been updated to current date and time."
-                )
-            else:
-                print("No record found with the specified IQ Wiki URL.")
-            return indexed_at
-
-        except psycopg2.Error as error:
-            print(f"Error: {error}")
+import bootstrap
+from checkpoints import get_checkpoints
+from fingerprints import get_fingerprints
+from frontier import get_frontier
+from http_session import get_session, stats
+from instrumentation import metrics
+from notifier import get_notifier
+from paginator import Paginator
+from records import RecordBuilder, SeenSet, iter_batches
+from registry import Scraper
+from retry import RetryPolicy
+
+class IQWiki(Scraper):
+    name = "iq_wiki"
+
+    # the "Source" row holding this scraper's "indexedAt"
+    SOURCE_URL = "https://graph.everipedia.org/graphql"
+
+    def __get_most_recent_timestamp(self):
+        # read from the shared checkpoint store (one query covers every
+        # source); the new value is only written back after a successful run
+        if self.checkpoints is None:
             return None
-
-        finally:
-            if conn:
-                cursor.close()
-                conn.close()
+        indexed_at = self.checkpoints.get(self.SOURCE_URL)
+        if indexed_at is None:
+            print("No record found with the specified IQ Wiki URL.")
+            return None
+        print(f"indexedAt value for Source IQ Wiki: {indexed_at}")
+        self.checkpoints.stage(self.SOURCE_URL, datetime.now(), source=self.name)
+        return indexed_at
 
     def __init__(self):
-        self.url = "https://graph.everipedia.org/graphql"
+        self.url = os.getenv("IQ_WIKI_GRAPHQL_URL", "https://graph.everipedia.org/graphql")
 
         self.query_new_wikis = """
         {
@@ -76,91 +51,156 @@ class IQWiki:
             }
         }
         """
+        # metadata only, wiki bodies are fetched afterwards for the ones we need
+        self.query_new_wiki_ids = """
+        {
+            activities(lang: "en") {
+                datetime
+                content {
+                    id
+                }
+            }
+        }
+        """
+        # "incremental" (ids first, then content) or "full" (whole feed at once)
+        self.fetch_mode = os.getenv("IQ_WIKI_FETCH_MODE", "incremental")
+        self.content_batch_size = int(os.getenv("IQ_WIKI_CONTENT_BATCH", "20"))
         # creating a logging object
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.WARNING)
         # setting connection pool to stop debug level messages
         urllib3_logger = logging.getLogger("urllib3.connectionpool")
         urllib3_logger.setLevel(logging.WARNING)
-        # setting variables to log at a discord channel
+        self.session = get_session()
+        self.retry_policy = RetryPolicy.from_env()
+        self.notifier = get_notifier()
+        self.fingerprints = get_fingerprints()
+        self.checkpoints = get_checkpoints()
+        self.frontier = get_frontier()
+
+    def __fetch_wiki_contents(self, wiki_ids):
+        # one request for the whole batch, each wiki under its own alias
+        fields = "\n".join(
+            f"w{index}: wiki(id: {json.dumps(wiki_id)}) {{ id title content }}"
+            for index, wiki_id in enumerate(wiki_ids)
+        )
+        response = self.session.post(url=self.url, json={"query": f"{{\n{fields}\n}}"})
+        response.raise_for_status()
+        with metrics.timer("parse"):
+            data = response.json()["data"]
+        return [data.get(f"w{index}") for index in range(len(wiki_ids))]
+
+    @staticmethod
+    def __record(wiki_id, title, content):
+        return ["IQ Wiki", f"https://iq.wiki/wiki/{wiki_id}", title, content]
+
+    def __fill_wiki_contents(self, wiki_ids):
+        # each batch's wikis are kept in the frontier as soon as they arrive.
+        # a batch whose request failed stays in the frontier and fails the
+        # run, so its wikis are fetched again next time instead of dropped
+        failed = []
+        for start in range(0, len(wiki_ids), self.content_batch_size):
+            batch = wiki_ids[start : start + self.content_batch_size]
+            try:
+                wikis = self.retry_policy.call(self.__fetch_wiki_contents, batch)
+            except requests.exceptions.RequestException as exception:
+                self.__log_to_discord(f"failed to fetch wiki content for {batch}: {exception}")
+                failed.append(exception)
+                continue
+            self.frontier.finish(
+                self.name,
+                [
+                    # None: deleted or hidden since the activity was recorded
+                    (wiki_id, None if wiki is None else self.__record(wiki_id, wiki["title"], wiki["content"]))
+                    for wiki_id, wiki in zip(batch, wikis)
+                ],
+            )
+        if failed:
+            raise RuntimeError(
+                f"{len(failed)} wiki content batches failed, they are retried next run"
+            ) from failed[-1]
 
-        self.webhook_url = os.getenv("WEBHOOK_URL")
+    def __fetch_activities(self, query):
+        response = self.session.post(url=self.url, json={"query": query})
+        response.raise_for_status()
+        with metrics.timer("parse"):
+            return response.json()["data"]["activities"]
 
     def __scrape_new_urls(self, cut_off_date):
-        response = requests.post(url=self.url, json={"query": self.query_new_wikis})
-
-        if response.status_code == 200:
-            data = response.json()
-            activities = data["data"]["activities"]
-
-            new_wikis = {}
-            for activity in activities:
-                activity_date_time = parser.parse(activity["datetime"])
-                activity_date_time = activity_date_time.astimezone(
-                    timezone.utc
-                ).replace(tzinfo=None)
-                if activity_date_time > cut_off_date:
-                    contents = activity["content"]
-                    for content in contents:
-                        wiki_id = content["id"]
-                        if (
-                            wiki_id not in new_wikis
-                            or activity_date_time > new_wikis[wiki_id]["datetime"]
-                        ):
-                            new_wikis[wiki_id] = {
-                                "datetime": activity_date_time,
-                                "title": content["title"],
-                                "content": content["content"],
-                            }
-
-            return new_wikis
-        else:
-            self.__log_to_discord(f"failed to establish connection to {response.url}")
-            print(f"Error: {response.status_code}")
-            print(response.text)
-            return {}
+        incremental = self.fetch_mode == "incremental"
+        query = self.query_new_wiki_ids if incremental else self.query_new_wikis
+        try:
+            activities = self.retry_policy.call(self.__fetch_activities, query)
+        except requests.exceptions.RequestException as exception:
+            # raised, so the staged "indexedAt" isn't committed and the
+            # activities since the last run are listed again next time
+            self.__log_to_discord(f"failed to establish connection to {self.url}: {exception}")
+            print(f"Error: {exception}")
+            raise
+
+        from dateutil import parser
+
+        new_wikis = {}
+        for activity in activities:
+            activity_date_time = parser.parse(activity["datetime"])
+            activity_date_time = activity_date_time.astimezone(
+                timezone.utc
+            ).replace(tzinfo=None)
+            if activity_date_time > cut_off_date:
+                contents = activity["content"]
+                for content in contents:
+                    wiki_id = content["id"]
+                    if (
+                        wiki_id not in new_wikis
+                        or activity_date_time > new_wikis[wiki_id]["datetime"]
+                    ):
+                        new_wikis[wiki_id] = {
+                            "datetime": activity_date_time,
+                            "title": content.get("title"),
+                            "content": content.get("content"),
+                        }
+
+        return new_wikis
 
     def __scrape_new_urls_today(self):
-        # cut_off_date = self.__get_most_recent_timestamp()
-        start_date = datetime(2022, 7, 1, tzinfo=timezone.utc)
-        end_date = datetime(2023, 5, 1, tzinfo=timezone.utc)
+        cut_off_date = self.__get_most_recent_timestamp()
+        if cut_off_date is None:
+            # no checkpoint yet, test with a random date instead
+            start_date = datetime(2022, 7, 1, tzinfo=timezone.utc)
+            end_date = datetime(2023, 5, 1, tzinfo=timezone.utc)
 
-        random_dt = self.__random_date(start_date, end_date)
-        random_dt_str = random_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+            random_dt = self.__random_date(start_date, end_date)
+            random_dt_str = random_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
 
-        cut_off_date = datetime.strptime(random_dt_str, "%Y-%m-%dT%H:%M:%SZ")
+            cut_off_date = datetime.strptime(random_dt_str, "%Y-%m-%dT%H:%M:%SZ")
         self.__log_to_discord(
             f"last indexed date at DB: {cut_off_date} for [{self.url}]",
             color=16776960,
         )
         new_wikis = self.__scrape_new_urls(cut_off_date)
 
-        reframed_data_frame = pd.DataFrame(
-            columns=["source", "url", "title", "content"]
-        )
-
-        for wiki_id, wiki_data in (
-            new_wikis.items() if isinstance(new_wikis, dict) else new_wikis.iterrows()
-        ):
-            if isinstance(new_wikis, pd.DataFrame):
-                wiki_id = wiki_data["wikiid"]
-                wiki_data = wiki_data.drop("wikiid")
-
-            source = "IQ Wiki"
-            url = f"https://iq.wiki/wiki/{wiki_id}"
-            title = wiki_data["title"]
-            content = wiki_data["content"]
-            temp_data_frame = pd.DataFrame(
-                {
-                    "source": [source],
-                    "url": [url],
-                    "title": [title],
-                    "content": [content],
-                }
-            )
-            reframed_data_frame = pd.concat(
-                [reframed_data_frame, temp_data_frame], ignore_index=True
+        # listed wikis go through the frontier, so the ones an interrupted run
+        # didn't get to are picked up here and the ones it did are reused
+        self.frontier.add(self.name, list(new_wikis))
+        todo = list(self.frontier.claim(self.name))
+        if self.fetch_mode == "incremental":
+            self.__fill_wiki_contents(todo)
+        else:
+            # bodies came with the listing, unless left over from earlier
+            self.frontier.finish(
+                self.name,
+                [
+                    (wiki_id, self.__record(wiki_id, new_wikis[wiki_id]["title"], new_wikis[wiki_id]["content"]))
+                    for wiki_id in todo
+                    if wiki_id in new_wikis
+                ],
             )
+            leftovers = [wiki_id for wiki_id in todo if wiki_id not in new_wikis]
+            self.__fill_wiki_contents(leftovers)
+
+        records = RecordBuilder()
+        records.extend(self.frontier.records(self.name))
+        reframed_data_frame = records.to_frame()
         self.__log_to_discord(
             "following urls are scraped for updation:\n"
             + "\n".join(reframed_data_frame["url"][:]),
@@ -168,96 +208,53 @@ class IQWiki:
         )
         return reframed_data_frame
 
-    def __scrape_all_urls(self):
-        data_frame = pd.DataFrame(columns=["id", "title", "content"])
-        offset = 0
-        limit = 50
-        has_more_data = True
-
-        while has_more_data:
-            query = f"""
-            {{
-                wikis(limit: {limit}, offset: {offset}) {{
-                    id
-                    title
-                    content
-                }}
+    def __fetch_wikis_page(self, offset, limit):
+        query = f"""
+        {{
+            wikis(limit: {limit}, offset: {offset}) {{
+                id
+                title
+                content
             }}
-            """
-
-            response = requests.post(url=self.url, json={"query": query})
-
-            freshDf = pd.DataFrame(response.json()["data"]["wikis"])
-
-            if len(freshDf) < limit:
-                has_more_data = False
-
-            data_frame = pd.concat([data_frame, freshDf], axis=0, ignore_index=True)
-
-            offset += limit
-
-        data_frame = data_frame.drop_duplicates(subset=["id"])
-
-        # wikis = self.scrape_all_urls()
-        data_frame.rename(columns={data_frame.columns[0]: "wikiid"}, inplace=True)
-
-        reframed_data_frame = pd.DataFrame(
-            columns=["source", "url", "title", "content"]
-        )
-
-        for wiki_id, wiki_data in (
-            data_frame.items()
-            if isinstance(data_frame, dict)
-            else data_frame.iterrows()
-        ):
-            if isinstance(data_frame, pd.DataFrame):
-                wiki_id = wiki_data["wikiid"]
-                wiki_data = wiki_data.drop("wikiid")
-
-            source = "IQ Wiki"
-            url = f"https://iq.wiki/wiki/{wiki_id}"
-            title = wiki_data["title"]
-            content = wiki_data["content"]
-            temp_data_frame = pd.DataFrame(
-                {
-                    "source": [source],
-                    "url": [url],
-                    "title": [title],
-                    "content": [content],
+        }}
+        """
+        response = self.session.post(url=self.url, json={"query": query})
+        response.raise_for_status()
+        with metrics.timer("parse"):
+            return response.json()["data"]["wikis"]
+
+    def iter_all_wikis(self, batch_size=None):
+        # streams every wiki page by page, so memory stays flat however big
+        # the corpus is. yields record dicts, or DataFrames of batch_size rows
+        if batch_size is not None:
+            yield from iter_batches(self.iter_all_wikis(), batch_size)
+            return
+
+        seen_ids = SeenSet()
+        # several pages in flight at once, in order, until a short page shows up
+        paginator = Paginator(self.__fetch_wikis_page, retry_policy=self.retry_policy)
+        for wikis in paginator:
+            for wiki in wikis:
+                # same wiki can show up on two pages if the list shifts underneath us
+                if not seen_ids.add(wiki["id"]):
+                    continue
+                yield {
+                    "source": "IQ Wiki",
+                    "url": f"https://iq.wiki/wiki/{wiki['id']}",
+                    "title": wiki["title"],
+                    "content": wiki["content"],
                 }
-            )
-            reframed_data_frame = pd.concat(
-                [reframed_data_frame, temp_data_frame], ignore_index=True
-            )
 
-        return reframed_data_frame
+    def __scrape_all_urls(self):
+        records = RecordBuilder()
+        records.extend(self.iter_all_wikis())
+        return records.to_frame()
 
     """start here for logging common file"""
 
-    def __log_to_discord(self, message, color=16711680, retries=3):  # by-default red
-        payload = self.__create_payload(message, color)
-        try:
-            response = requests.post(
-                self.webhook_url,
-                data=json.dumps(payload),
-                headers={"Content-Type": "application/json"},
-            )
-            response.raise_for_status()
-        except requests.exceptions.RequestException as exception:
-            if retries > 0:
-                # logging.debug(f'Error: While scraping {url} {exception}. Retrying in 5 seconds...')
-                time.sleep(5)
-                return self.__log_to_discord(message, retries - 1)
-            else:
-                """self.logger.setLevel(logging.WARNING)
-                self.logger.warning(
-                    f"Error Logging to discord: {exception} After 3 retries, No retries left. Check/Debug URL passed!"
-                )"""
-                # logs to local file after 3 failed calls
-                self.logger.error(
-                    f"Error Logging to discord: {exception} After 3 retries, No retries left. Check/Debug URL passed!"
-                )
-                return None
+    def __log_to_discord(self, message, color=16711680):  # by-default red
+        # queued, the shared sink batches and delivers in the background
+        self.notifier.send(self.__create_payload(message, color))
 
     def __create_payload(self, message, color=16711680):
         if isinstance(message, list):
@@ -297,9 +294,12 @@ class IQWiki:
     """ end here for logging + testing with random date"""
 
     def scrape(self):
+        self.retry_policy.start()
         try:
             self.__log_to_discord("initiating IQ Wiki scraper", color=65280)
             data_frame = self.__scrape_new_urls_today()
+            # drop wikis whose text is the same as the last time we saw them
+            data_frame = self.fingerprints.drop_unchanged(data_frame, source=self.name)
             if data_frame is not None:
                 self.__log_to_discord(
                     f"scraping successful... {data_frame.shape[0]} urls are updated!",
@@ -310,6 +310,13 @@ class IQWiki:
             self.__log_to_discord("finished scraping IQ Wiki!!", color=65280)
 
 
-obj = IQWiki()
-print(obj.scrape())
-# print(obj.scrape_all_urls())
+if __name__ == "__main__":
+    bootstrap.load_env()
+    obj = IQWiki()
+    print(obj.scrape())
+    # the output is out, move the checkpoints forward
+    import runner
+
+    runner.commit_sources([obj.name])
+    print(f"http connections: {stats.as_dict()}")
+    # print(obj.scrape_all_urls())
@@ -0,0 +1,212 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from http_session import get_session
+from instrumentation import metrics
+from retry import RetryPolicy
+
+# discord webhook limits, see https://discord.com/developers/docs/resources/message#embed-object-embed-limits
+MAX_EMBEDS = 10
+MAX_DESCRIPTION = 4096
+MAX_TOTAL_CHARS = 6000
+
+_STOP = object()
+
+
+def _embed_size(embed):
+    return len(embed.get("title", "")) + len(embed.get("description", ""))
+
+
+def split_embed(embed):
+    # breaks an embed whose description is over the limit into several
+    description = embed.get("description") or ""
+    if len(description) <= MAX_DESCRIPTION:
+        return [embed]
+    chunk = MAX_DESCRIPTION - len(embed.get("title", ""))
+    return [
+        dict(embed, description=description[start : start + chunk])
+        for start in range(0, len(description), chunk)
+    ]
+
+
+def coalesce(embeds):
+    # packs embeds into as few payloads as the limits allow, keeping order
+    payloads = []
+    current, size = [], 0
+    for embed in embeds:
+        for part in split_embed(embed):
+            part_size = _embed_size(part)
+            if current and (
+                len(current) == MAX_EMBEDS or size + part_size > MAX_TOTAL_CHARS
+            ):
+                payloads.append({"content": "", "embeds": current})
+                current, size = [], 0
+            current.append(part)
+            size += part_size
+    if current:
+        payloads.append({"content": "", "embeds": current})
+    return payloads
+
+
+class NotificationSink:
+    """queues notifications and delivers them from a background thread.
+
+    embeds that arrive within `flush_interval` of each other are coalesced
+    into one payload, subclasses only decide where a payload ends up.
+    """
+
+    def __init__(self, flush_interval=None):
+        if flush_interval is None:
+            flush_interval = float(os.getenv("NOTIFY_FLUSH_INTERVAL", "1.0"))
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger(__name__)
+        self.sent_payloads = 0
+        self.__queue = queue.Queue()
+        self.__flushing = threading.Event()
+        self.__closed = False
+        self.__thread = threading.Thread(
+            target=self.__run, name=type(self).__name__, daemon=True
+        )
+        self.__thread.start()
+
+    def send(self, payload):
+        # accepts a full webhook payload ({"content": .., "embeds": [..]})
+        if self.__closed:
+            return
+        for embed in payload.get("embeds", []):
+            self.__queue.put(embed)
+
+    def flush(self):
+        # blocks until everything queued so far has been delivered
+        self.__flushing.set()
+        try:
+            self.__queue.join()
+        finally:
+            self.__flushing.clear()
+
+    def close(self):
+        if self.__closed:
+            return
+        self.flush()
+        self.__closed = True
+        self.__queue.put(_STOP)
+        self.__thread.join()
+
+    def _deliver(self, payload):
+        raise NotImplementedError
+
+    def __collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = deadline - time.monotonic()
+            try:
+                if self.__flushing.is_set() or timeout <= 0:
+                    item = self.__queue.get_nowait()
+                else:
+                    item = self.__queue.get(timeout=timeout)
+            except queue.Empty:
+                return batch, False
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+
+    def __run(self):
+        while True:
+            item = self.__queue.get()
+            if item is _STOP:
+                self.__queue.task_done()
+                return
+            batch, stop = self.__collect(item)
+            for payload in coalesce(batch):
+                try:
+                    with metrics.timer("notify"):
+                        self._deliver(payload)
+                    self.sent_payloads += 1
+                except Exception as exception:
+                    self.logger.error(
+                        f"Error Logging to discord: {exception} No retries left. Check/Debug URL passed!"
+                    )
+            for _ in range(len(batch) + stop):
+                self.__queue.task_done()
+            if stop:
+                return
+
+
+class DiscordSink(NotificationSink):
+    def __init__(self, webhook_url, session=None, retry_policy=None, **kwargs):
+        self.webhook_url = webhook_url
+        self.session = session or get_session()
+        self.retry_policy = retry_policy or RetryPolicy(retries=5, deadline=None)
+        self.__blocked_until = 0.0
+        super().__init__(**kwargs)
+
+    def __post(self, payload):
+        wait = self.__blocked_until - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        response = self.session.post(
+            self.webhook_url,
+            data=json.dumps(payload),
+            headers={"Content-Type": "application/json"},
+        )
+        # 429s carry Retry-After, which the retry policy already honours
+        response.raise_for_status()
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            reset_after = float(response.headers.get("X-RateLimit-Reset-After", "0"))
+            self.__blocked_until = time.monotonic() + reset_after
+
+    def _deliver(self, payload):
+        self.retry_policy.call(self.__post, payload)
+
+
+class FileSink(NotificationSink):
+    # writes one json payload per line, handy for runs without network access
+    def __init__(self, path, **kwargs):
+        self.path = path
+        super().__init__(**kwargs)
+
+    def _deliver(self, payload):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(payload, ensure_ascii=False) + "\n")
+
+
+class StdoutSink(NotificationSink):
+    def _deliver(self, payload):
+        for embed in payload["embeds"]:
+            print(f"{embed.get('title', '')} {embed.get('description', '')}")
+
+
+def create_sink(target=None):
+    # NOTIFY_SINK is "discord", "stdout" or "file:<path>", defaults to discord
+    # when WEBHOOK_URL is set and stdout otherwise
+    target = target or os.getenv("NOTIFY_SINK")
+    if target is None:
+        target = "discord" if os.getenv("WEBHOOK_URL") else "stdout"
+    if target == "discord":
+        return DiscordSink(os.getenv("WEBHOOK_URL"))
+    if target == "stdout":
+        return StdoutSink()
+    if target.startswith("file:"):
+        return FileSink(target[len("file:") :])
+    raise ValueError(f"unknown NOTIFY_SINK {target!r}")
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_notifier():
+    # one sink shared by every scraper in the process, flushed once at exit
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = create_sink()
+                atexit.register(_sink.close)
+    return _sink
@@ -0,0 +1,53 @@
+import threading
+
+from extractors import get_extractor
+from http_cache import NOT_MODIFIED, get_cache
+from http_session import get_session
+from instrumentation import metrics
+
+
+class Pages:
+    """single-attempt page downloads for the html scrapers.
+
+    requests go through the pooled keep-alive session every scraper shares,
+    cached ones through the on-disk cache so an unchanged page is answered
+    with a 304, and articles through the configured extractor (soup by
+    default). every method raises on failure, retrying is up to the
+    caller's retry policy.
+    """
+
+    def __init__(self, session=None, http_cache=None, extract=None):
+        self.session = session or get_session()
+        self.http_cache = http_cache or get_cache()
+        self.extract = extract or get_extractor()
+
+    def get(self, url):
+        response = self.session.get(url)
+        response.raise_for_status()
+        return response
+
+    def get_cached(self, url):
+        # NOT_MODIFIED when the page is the same as last run
+        response = self.http_cache.get(self.session, url)
+        if response.not_modified:
+            return NOT_MODIFIED
+        return response
+
+    def article(self, url):
+        # (title, content), without keeping the page tree around
+        response = self.get(url)
+        with metrics.timer("extract"):
+            return self.extract(response.text)
+
+
+_pages = None
+_pages_lock = threading.Lock()
+
+
+def get_pages():
+    global _pages
+    if _pages is None:
+        with _pages_lock:
+            if _pages is None:
+                _pages = Pages()
+    return _pages
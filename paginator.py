@@ -0,0 +1,103 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from instrumentation import submit
+
+
+class Paginator:
+    """pages through an offset/limit api with several requests in flight.
+
+    fetch_page(offset, limit) returns the list of items on that page. pages
+    are yielded in offset order. a page shorter than its limit marks the end
+    of the data, anything still in flight past that point is cancelled.
+
+    the page size adapts to how long pages take: it halves when a page is
+    slower than target_latency and doubles again when pages come back in
+    under half of it, always staying within [min_page_size, max_page_size].
+    max_page_size must not be above what the server will return per page,
+    otherwise a capped page would look like the end of the data.
+    """
+
+    def __init__(
+        self,
+        fetch_page,
+        page_size=50,
+        window=None,
+        min_page_size=10,
+        max_page_size=50,
+        target_latency=2.0,
+        retry_policy=None,
+    ):
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.window = window or int(os.getenv("PAGINATOR_WINDOW", "4"))
+        self.min_page_size = min_page_size
+        self.max_page_size = max_page_size
+        self.target_latency = target_latency
+        self.retry_policy = retry_policy
+        self.requested_pages = 0
+        self.cancelled_pages = 0
+
+    def __fetch(self, offset, limit):
+        start = time.monotonic()
+        if self.retry_policy is not None:
+            items = self.retry_policy.call(self.fetch_page, offset, limit)
+        else:
+            items = self.fetch_page(offset, limit)
+        return items, time.monotonic() - start
+
+    def __adapt(self, latency):
+        if latency > self.target_latency:
+            self.page_size = max(self.page_size // 2, self.min_page_size)
+        elif latency < self.target_latency / 2:
+            self.page_size = min(self.page_size * 2, self.max_page_size)
+
+    def __iter__(self):
+        next_offset = 0
+        emit_offset = 0
+        end_offset = None
+        in_flight = {}  # future -> (offset, limit)
+        finished = {}  # offset -> (limit, items), waiting for earlier pages
+
+        executor = ThreadPoolExecutor(max_workers=self.window)
+        try:
+            while True:
+                while end_offset is None and len(in_flight) < self.window:
+                    limit = self.page_size
+                    future = submit(executor, self.__fetch, next_offset, limit)
+                    in_flight[future] = (next_offset, limit)
+                    self.requested_pages += 1
+                    next_offset += limit
+
+                if not in_flight and emit_offset not in finished:
+                    return
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future not in in_flight:
+                        # dropped a moment ago, it was past the end of the data
+                        continue
+                    offset, limit = in_flight.pop(future)
+                    items, latency = future.result()
+                    if end_offset is not None and offset >= end_offset:
+                        continue
+                    self.__adapt(latency)
+                    finished[offset] = (limit, items)
+                    if len(items) < limit:
+                        end_offset = offset + len(items)
+                        for other, (other_offset, _) in list(in_flight.items()):
+                            if other_offset >= end_offset:
+                                other.cancel()
+                                del in_flight[other]
+                                self.cancelled_pages += 1
+
+                while emit_offset in finished:
+                    limit, items = finished.pop(emit_offset)
+                    if items:
+                        yield items
+                    emit_offset += limit
+                    if end_offset is not None and emit_offset >= end_offset:
+                        return
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,97 @@
+import io
+import os
+import time
+
+from checkpoints import database_settings
+from records import COLUMNS, iter_frames
+
+
+class PostgresSink:
+    """loads scraped records into postgres with COPY instead of row inserts.
+
+    every batch is streamed as csv into a temporary staging table and merged
+    into the target table with one INSERT ... ON CONFLICT (url) DO UPDATE,
+    so re-scraped urls replace their previous title/content. the whole write
+    is one transaction.
+    """
+
+    def __init__(self, table=None, batch_size=None, connect_kwargs=None):
+        self.table = table or os.getenv("PG_SINK_TABLE", "ScrapedArticle")
+        self.batch_size = batch_size or int(os.getenv("PG_SINK_BATCH", "5000"))
+        self.connect_kwargs = connect_kwargs or database_settings()
+        self.__conn = None
+
+    def __connect(self):
+        if self.__conn is None or self.__conn.closed:
+            import psycopg2
+
+            self.__conn = psycopg2.connect(**self.connect_kwargs)
+        return self.__conn
+
+    def __prepare(self, cursor):
+        from psycopg2 import sql
+
+        table = sql.Identifier(self.table)
+        cursor.execute(
+            sql.SQL(
+                "CREATE TABLE IF NOT EXISTS {} ("
+                "source TEXT, url TEXT PRIMARY KEY, title TEXT, content TEXT, "
+                '"scrapedAt" TIMESTAMP NOT NULL DEFAULT now())'
+            ).format(table)
+        )
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS scraped_staging "
+            "(source TEXT, url TEXT, title TEXT, content TEXT) ON COMMIT DROP"
+        )
+
+    def __merge(self, cursor):
+        from psycopg2 import sql
+
+        # DISTINCT ON keeps one row per url, ON CONFLICT can't take the same
+        # key twice in a statement
+        cursor.execute(
+            sql.SQL(
+                "INSERT INTO {} (source, url, title, content) "
+                "SELECT DISTINCT ON (url) source, url, title, content "
+                "FROM scraped_staging WHERE url IS NOT NULL "
+                "ON CONFLICT (url) DO UPDATE SET source = EXCLUDED.source, "
+                'title = EXCLUDED.title, content = EXCLUDED.content, "scrapedAt" = now()'
+            ).format(sql.Identifier(self.table))
+        )
+        cursor.execute("TRUNCATE scraped_staging")
+
+    def write(self, data):
+        """writes a DataFrame, or an iterable of DataFrames, and returns the
+        number of rows loaded. only the source/url/title/content columns are
+        used.
+        """
+        conn = self.__connect()
+        rows = 0
+        start = time.monotonic()
+        try:
+            with conn.cursor() as cursor:
+                self.__prepare(cursor)
+                for frame in iter_frames(data, self.batch_size):
+                    buffer = io.StringIO()
+                    frame[COLUMNS].to_csv(buffer, index=False, header=False)
+                    buffer.seek(0)
+                    cursor.copy_expert(
+                        "COPY scraped_staging (source, url, title, content) "
+                        "FROM STDIN WITH (FORMAT csv)",
+                        buffer,
+                    )
+                    self.__merge(cursor)
+                    rows += frame.shape[0]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        elapsed = time.monotonic() - start
+        rate = rows / elapsed if elapsed > 0 else 0.0
+        print(f"postgres sink: {rows} rows into {self.table} in {elapsed:.2f}s ({rate:.0f} rows/s)")
+        return rows
+
+    def close(self):
+        if self.__conn is not None:
+            self.__conn.close()
+            self.__conn = None
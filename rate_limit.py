@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+from retry import parse_retry_after
+
+# requests per second per host, anything else gets RATE_LIMIT_DEFAULT. discord
+# isn't limited here, the notifier follows its rate limit headers already
+HOST_RATES = {
+    "apnews.com": 4.0,
+    "flywheeldefi.com": 4.0,
+    "graph.everipedia.org": 5.0,
+    "discord.com": None,
+}
+
+THROTTLE_STATUSES = {429, 503}
+
+
+class TokenBucket:
+    """`rate` tokens per second, up to `capacity` saved up for bursts.
+
+    reserve() takes a token right away and returns how long the caller has
+    to wait before using it, so waiting happens outside the lock and
+    concurrent callers are spaced out at exactly `rate` instead of all
+    waking up at once.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def __refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        with self.__lock:
+            self.__refill()
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def set_rate(self, rate, capacity=None):
+        with self.__lock:
+            self.__refill()
+            self.rate = rate
+            if capacity is not None:
+                self.capacity = capacity
+                self.tokens = min(self.tokens, capacity)
+
+    def pause(self, seconds):
+        # nothing goes out for at least `seconds`
+        with self.__lock:
+            self.__refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class _Host:
+    def __init__(self, rate):
+        self.ceiling = rate
+        self.bucket = TokenBucket(rate)
+        self.robots_checked = False
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.waits = 0
+        self.waited = 0.0
+        self.throttled = 0
+
+
+class RateLimiter:
+    """per-host politeness for every request made through the shared session.
+
+    each host has a token bucket at its configured rate, lowered to match a
+    robots.txt Crawl-delay when there is one. a 429/503 halves the host's
+    rate (and honours Retry-After), every good response after that brings it
+    back up by a tenth of the ceiling, so throughput recovers to the allowed
+    maximum instead of staying low.
+    """
+
+    def __init__(self, rates=None, default_rate=None, min_rate=None, robots=None):
+        self.rates = dict(HOST_RATES if rates is None else rates)
+        for entry in filter(None, os.getenv("RATE_LIMITS", "").split(",")):
+            # RATE_LIMITS=apnews.com=2,example.com=10
+            host, _, rate = entry.partition("=")
+            self.rates[host.strip()] = float(rate)
+        self.default_rate = default_rate or float(os.getenv("RATE_LIMIT_DEFAULT", "8"))
+        self.min_rate = min_rate or float(os.getenv("RATE_LIMIT_MIN", "0.2"))
+        if robots is None:
+            robots = os.getenv("RATE_LIMIT_ROBOTS", "1") != "0"
+        self.robots = robots
+        self.max_pause = float(os.getenv("RATE_LIMIT_MAX_PAUSE", "60"))
+        self.__hosts = {}
+        self.__lock = threading.Lock()
+
+    def __host_rate(self, host):
+        for name, rate in self.rates.items():
+            if host == name or host.endswith("." + name):
+                return rate
+        return self.default_rate
+
+    def __host(self, host):
+        # None for hosts that aren't limited
+        with self.__lock:
+            if host not in self.__hosts:
+                rate = self.__host_rate(host)
+                self.__hosts[host] = _Host(rate) if rate else None
+            return self.__hosts[host]
+
+    def __apply_robots(self, state, scheme, host, fetch):
+        # other requests to the host wait on the lock until this is done
+        with state.lock:
+            if state.robots_checked:
+                return
+            try:
+                response = fetch(f"{scheme}://{host}/robots.txt")
+                if response.status_code != 200:
+                    return
+                parser = RobotFileParser()
+                parser.parse(response.text.splitlines())
+                delay = parser.crawl_delay("*")
+                if delay:
+                    state.ceiling = min(state.ceiling, 1.0 / float(delay))
+                    # a crawl delay means one request at a time, no bursts
+                    state.bucket.set_rate(state.ceiling, capacity=1.0)
+            except Exception:
+                return
+            finally:
+                state.robots_checked = True
+
+    def wait(self, url, fetch=None):
+        """blocks until a request to url is allowed and returns the seconds
+        spent waiting. fetch(url) is used for robots.txt, the first time a
+        host is seen.
+        """
+        parts = urlsplit(url)
+        state = self.__host(parts.netloc)
+        if state is None:
+            return 0.0
+        if self.robots and fetch is not None and not state.robots_checked:
+            self.__apply_robots(state, parts.scheme, parts.netloc, fetch)
+        delay = state.bucket.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        with state.lock:
+            state.requests += 1
+            if delay > 0:
+                state.waits += 1
+                state.waited += delay
+        return delay
+
+    def observe(self, url, response):
+        # adapts the host's rate to how the server answered
+        state = self.__host(urlsplit(url).netloc)
+        if state is None:
+            return
+        bucket = state.bucket
+        if response.status_code in THROTTLE_STATUSES:
+            with state.lock:
+                state.throttled += 1
+            bucket.set_rate(max(self.min_rate, bucket.rate / 2))
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after:
+                bucket.pause(min(retry_after, self.max_pause))
+        elif response.status_code < 400 and bucket.rate < state.ceiling:
+            bucket.set_rate(min(state.ceiling, bucket.rate + state.ceiling / 10))
+
+    def as_dict(self):
+        with self.__lock:
+            hosts = {host: state for host, state in self.__hosts.items() if state is not None}
+        return {
+            host: {
+                "requests": state.requests,
+                "waits": state.waits,
+                "waited": round(state.waited, 3),
+                "throttled": state.throttled,
+                "rate": round(state.bucket.rate, 3),
+            }
+            for host, state in hosts.items()
+        }
@@ -0,0 +1,153 @@
+import hashlib
+from datetime import date, datetime
+
+from instrumentation import metrics
+
+COLUMNS = ["source", "url", "title", "content"]
+
+
+class RecordBuilder:
+    """collects scraped rows column by column and builds the DataFrame once.
+
+    appending a row is a few list appends, instead of a one-row DataFrame
+    plus a pd.concat that copies everything collected so far.
+    """
+
+    def __init__(self, columns=None):
+        self.columns = list(columns or COLUMNS)
+        self.__data = {column: [] for column in self.columns}
+
+    def __len__(self):
+        return len(self.__data[self.columns[0]])
+
+    def append(self, *values, **named):
+        # values in column order, or by column name
+        if values:
+            named = dict(zip(self.columns, values), **named)
+        for column in self.columns:
+            self.__data[column].append(named[column])
+
+    def extend(self, rows):
+        for row in rows:
+            if isinstance(row, dict):
+                self.append(**row)
+            else:
+                self.append(*row)
+
+    def to_frame(self):
+        # pandas is only imported once a frame is actually built
+        import pandas as pd
+
+        with metrics.timer("dataframe"):
+            if len(self) == 0:
+                return pd.DataFrame(columns=self.columns)
+            return pd.DataFrame(self.__data, columns=self.columns)
+
+
+def iter_batches(records, batch_size):
+    # groups a stream of record dicts into DataFrames of at most batch_size rows
+    builder = RecordBuilder()
+    for record in records:
+        builder.append(**record)
+        if len(builder) >= batch_size:
+            yield builder.to_frame()
+            builder = RecordBuilder()
+    if len(builder) > 0:
+        yield builder.to_frame()
+
+
+def _written_day(value):
+    # the calendar date a timestamp was written with, whatever its offset
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value.strip()[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def select_since(urls, timestamps, cut_off, format=None, strict=False, by_day=False):
+    """urls whose timestamp is at or after cut_off (after it when strict),
+    deduplicated in first-seen order.
+
+    timestamps are parsed in one go as a datetime column (with `format` when
+    given, naive values taken as utc) and compared against cut_off without
+    a python loop. by_day compares calendar days only, each one as written
+    (the leading YYYY-MM-DD of an iso 8601 value or datetime, whatever its
+    offset) against cut_off's own date. unparseable or missing timestamps
+    never match.
+    """
+    import pandas as pd
+
+    values = pd.Series(timestamps, dtype="object")
+    if by_day:
+        # a day is a date, not an instant, so nothing gets converted to utc
+        cut_off_day = _written_day(cut_off)
+        days = pd.Series([_written_day(value) for value in timestamps], dtype="object")
+        keep = days.notna() & (days > cut_off_day if strict else days >= cut_off_day)
+        return pd.Series(urls, dtype="object")[keep.to_numpy()].drop_duplicates().tolist()
+    if format is not None and format.endswith("Z"):
+        # a literal "Z" keeps pandas off its fast iso8601 parser, and utc=True
+        # already means the same thing
+        values, format = values.str.removesuffix("Z"), format[:-1]
+    candidates = pd.DataFrame(
+        {
+            "url": pd.Series(urls, dtype="object"),
+            "at": pd.to_datetime(values, format=format, utc=True, errors="coerce"),
+        }
+    )
+    cut_off = pd.Timestamp(cut_off)
+    cut_off = cut_off.tz_localize("UTC") if cut_off.tzinfo is None else cut_off.tz_convert("UTC")
+    at = candidates["at"]
+    selected = candidates.loc[at > cut_off if strict else at >= cut_off, "url"]
+    return selected.drop_duplicates().tolist()
+
+
+def iter_frames(data, batch_size):
+    # a DataFrame is cut into slices of batch_size rows, anything else is taken
+    # as an iterable of DataFrames (e.g. iter_batches) and passed through
+    if data is None:
+        return
+    if hasattr(data, "iloc"):
+        for start in range(0, data.shape[0], batch_size):
+            yield data.iloc[start : start + batch_size]
+        return
+    for frame in data:
+        if frame is not None and frame.shape[0] > 0:
+            yield frame
+
+
+class SeenSet:
+    """remembers which keys were already seen.
+
+    keys are reduced to 64-bit blake2b digests, so the memory per key is
+    small and doesn't depend on how long the keys are. collisions are
+    possible but need billions of keys to become likely.
+    """
+
+    def __init__(self):
+        self.__digests = set()
+
+    @staticmethod
+    def __digest(key):
+        return int.from_bytes(
+            hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest(), "little"
+        )
+
+    def __len__(self):
+        return len(self.__digests)
+
+    def __contains__(self, key):
+        return self.__digest(key) in self.__digests
+
+    def add(self, key):
+        # returns False when the key was already there
+        digest = self.__digest(key)
+        if digest in self.__digests:
+            return False
+        self.__digests.add(digest)
+        return True
@@ -0,0 +1,87 @@
+import importlib
+import json
+import os
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sources.json")
+
+
+class Scraper:
+    """what the runner expects from a source.
+
+    `name` identifies the source in config and reports, scrape() returns a
+    DataFrame with source/url/title/content columns, or None when there was
+    nothing new.
+    """
+
+    name = None
+
+    def scrape(self):
+        raise NotImplementedError
+
+
+# name -> "module:Class", imported only when the source is actually used
+SOURCES = {
+    "ap_news": "ap_news:APNews",
+    "flywheel": "fly_wheel:FlyWheel",
+    "iq_wiki": "iq_wikis:IQWiki",
+}
+
+
+def register(name, target=None):
+    # register("name", "module:Class"), or use as a class decorator
+    if target is not None:
+        SOURCES[name] = target
+        return target
+
+    def decorator(cls):
+        SOURCES[name] = cls
+        return cls
+
+    return decorator
+
+
+def resolve(target):
+    if isinstance(target, str):
+        module_name, _, attr = target.partition(":")
+        return getattr(importlib.import_module(module_name), attr)
+    return target
+
+
+def create(name, **options):
+    if name not in SOURCES:
+        raise KeyError(f"unknown source {name!r}, known sources: {sorted(SOURCES)}")
+    return resolve(SOURCES[name])(**options)
+
+
+def _read_config(config_path=None):
+    with open(config_path or DEFAULT_CONFIG, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def load_sources(config_path=None):
+    """reads the list of sources to run, each entry being
+    {"name": ..., "enabled": true, "class": "module:Class", "options": {...}}
+    where everything but the name is optional.
+    """
+    config = _read_config(config_path)
+    sources = []
+    for entry in config["sources"]:
+        if not entry.get("enabled", True):
+            continue
+        if "class" in entry:
+            register(entry["name"], entry["class"])
+        sources.append((entry["name"], entry.get("options", {})))
+    return sources
+
+
+def load_schedules(config_path=None):
+    """name -> {"interval": .., "max_interval": .., "jitter": ..} for the
+    sources that set any of these (seconds, used by the daemon)
+    """
+    config = _read_config(config_path)
+    keys = ("interval", "max_interval", "jitter")
+    return {
+        entry["name"]: {key: entry[key] for key in keys if key in entry}
+        for entry in config["sources"]
+        if any(key in entry for key in keys)
+    }
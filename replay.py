@@ -0,0 +1,195 @@
+"""record/replay for every request made through the shared session.
+
+    HTTP_REPLAY=record:cassettes/run1 python runner.py   # live, saves every answer
+    HTTP_REPLAY=replay:cassettes/run1 python runner.py   # answers from disk, offline
+
+a cassette is a directory with one json file per (method, url, body). when
+replaying, HTTP_REPLAY_LATENCY delays every answer (seconds) and
+HTTP_REPLAY_ERROR_RATE turns that fraction of them into 503s, so retries and
+rate limiting can be exercised without touching the real sites. a request
+that was never recorded fails like an unreachable host.
+"""
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# recorded bodies are stored decoded, these would no longer be true
+DROPPED_HEADERS = ("content-encoding", "transfer-encoding", "content-length")
+
+
+def _body_bytes(body):
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    if isinstance(body, (bytes, bytearray)):
+        return bytes(body)
+    # streamed/file bodies aren't something the scrapers send
+    return repr(body).encode("utf-8")
+
+
+def build_response(request, status, headers, content, reason=None, adapter=None):
+    # a complete requests.Response without a connection behind it
+    response = requests.Response()
+    response.status_code = status
+    response.reason = reason or ""
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = content
+    response._content_consumed = True
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = request.url
+    response.request = request
+    response.connection = adapter
+    return response
+
+
+class Cassette:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(method, url, body=None):
+        digest = hashlib.sha1()
+        digest.update(method.upper().encode("utf-8") + b"\n")
+        digest.update(url.encode("utf-8") + b"\n")
+        digest.update(_body_bytes(body))
+        return digest.hexdigest()
+
+    def __path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def put(self, method, url, body, status, headers, content, reason=None):
+        headers = {
+            name: value
+            for name, value in headers.items()
+            if name.lower() not in DROPPED_HEADERS
+        }
+        entry = {
+            "method": method.upper(),
+            "url": url,
+            "status": status,
+            "reason": reason,
+            "headers": headers,
+            "body": base64.b64encode(content or b"").decode("ascii"),
+        }
+        path = self.__path(self.key(method, url, body))
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(entry, file)
+        os.replace(temp_path, path)
+
+    def save(self, request, response):
+        self.put(
+            request.method,
+            request.url,
+            request.body,
+            response.status_code,
+            response.headers,
+            response.content,
+            response.reason,
+        )
+
+    def load(self, request):
+        try:
+            with open(self.__path(self.key(request.method, request.url, request.body)), encoding="utf-8") as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            return None
+        entry["body"] = base64.b64decode(entry["body"])
+        return entry
+
+
+class ReplayAdapter(BaseAdapter):
+    """transport adapter that records what `inner` answers, or replays it.
+
+    mounted in place of the session's own adapters by install().
+    """
+
+    def __init__(self, cassette, mode, inner=None, latency=0.0, error_rate=0.0, seed=None):
+        super().__init__()
+        if mode not in ("record", "replay"):
+            raise ValueError(f"unknown replay mode {mode!r}")
+        if mode == "record" and inner is None:
+            raise ValueError("recording needs an adapter to record from")
+        self.cassette = cassette
+        self.mode = mode
+        self.inner = inner
+        self.latency = latency
+        self.error_rate = error_rate
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+
+    def __inject_error(self):
+        if not self.error_rate:
+            return False
+        with self.__lock:
+            return self.__random.random() < self.error_rate
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.mode == "record":
+            response = self.inner.send(
+                request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies
+            )
+            self.cassette.save(request, response)
+            return response
+
+        if self.latency:
+            time.sleep(self.latency)
+        if self.__inject_error():
+            return build_response(
+                request, 503, {"Content-Type": "text/plain"}, b"injected error", "Service Unavailable", self
+            )
+        entry = self.cassette.load(request)
+        if entry is None:
+            raise requests.exceptions.ConnectionError(
+                f"no recording for {request.method} {request.url}", request=request
+            )
+        return build_response(
+            request, entry["status"], entry["headers"], entry["body"], entry["reason"], self
+        )
+
+    def close(self):
+        if self.inner is not None:
+            self.inner.close()
+
+
+def install(session, spec=None, inner=None):
+    """wraps every adapter mounted on session. spec is "record:<dir>" or
+    "replay:<dir>" (default HTTP_REPLAY). `inner` replaces the real
+    transport while recording, e.g. to record from a synthetic site.
+    returns the cassette.
+    """
+    spec = spec or os.getenv("HTTP_REPLAY")
+    mode, _, directory = spec.partition(":")
+    if not directory:
+        raise ValueError(f"HTTP_REPLAY should be record:<dir> or replay:<dir>, got {spec!r}")
+    cassette = Cassette(directory)
+    latency = float(os.getenv("HTTP_REPLAY_LATENCY", "0"))
+    error_rate = float(os.getenv("HTTP_REPLAY_ERROR_RATE", "0"))
+    seed = os.getenv("HTTP_REPLAY_SEED")
+    for prefix, adapter in list(session.adapters.items()):
+        session.mount(
+            prefix,
+            ReplayAdapter(
+                cassette,
+                mode,
+                inner=inner or adapter,
+                latency=latency,
+                error_rate=error_rate,
+                seed=seed,
+            ),
+        )
+    return cassette
@@ -0,0 +1,127 @@
+import os
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+
+def parse_retry_after(value):
+    # Retry-After is either a number of seconds or an http date
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class RetryPolicy:
+    """exponential backoff with jitter, honouring Retry-After.
+
+    an optional deadline for the whole run (RETRY_DEADLINE seconds, unset by
+    default) caps how long the backoff sleeps get once time runs short. it
+    never takes retries away, a late error is retried without waiting.
+
+    attempt numbers start at 0 for the first retry.
+    """
+
+    RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        retries=3,
+        backoff=0.5,
+        factor=2.0,
+        max_delay=30.0,
+        jitter=0.5,
+        deadline=None,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.deadline = deadline
+        self.start()
+
+    @classmethod
+    def from_env(cls):
+        deadline = os.getenv("RETRY_DEADLINE")
+        return cls(
+            retries=int(os.getenv("RETRY_ATTEMPTS", "3")),
+            backoff=float(os.getenv("RETRY_BACKOFF", "0.5")),
+            deadline=float(deadline) if deadline else None,
+        )
+
+    def start(self):
+        # (re)starts the clock the run deadline is measured against. scrapers
+        # call it at the start of every scrape(), the daemon reuses them
+        self.__started_at = time.monotonic()
+
+    def remaining(self):
+        if self.deadline is None:
+            return float("inf")
+        return self.deadline - (time.monotonic() - self.__started_at)
+
+    def is_retryable(self, exception):
+        if isinstance(exception, requests.exceptions.HTTPError):
+            response = exception.response
+            return response is None or response.status_code in self.RETRY_STATUSES
+        if isinstance(
+            exception,
+            (
+                requests.exceptions.InvalidURL,
+                requests.exceptions.MissingSchema,
+                requests.exceptions.InvalidSchema,
+            ),
+        ):
+            return False
+        return isinstance(exception, requests.exceptions.RequestException)
+
+    def is_permanent(self, exception):
+        # a 4xx answer that won't change however often it's asked again (404,
+        # 410, ...), the page is gone rather than unreachable for now
+        if not isinstance(exception, requests.exceptions.HTTPError):
+            return False
+        response = exception.response
+        return (
+            response is not None
+            and 400 <= response.status_code < 500
+            and response.status_code not in self.RETRY_STATUSES
+        )
+
+    def delay(self, attempt, exception=None):
+        response = getattr(exception, "response", None)
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                return retry_after
+        delay = min(self.backoff * self.factor**attempt, self.max_delay)
+        return delay + random.uniform(0, delay * self.jitter)
+
+    def next_delay(self, attempt, exception):
+        # seconds to wait before retrying, None when we should give up
+        if attempt >= self.retries or not self.is_retryable(exception):
+            return None
+        return min(self.delay(attempt, exception), max(self.remaining(), 0.0))
+
+    def call(self, func, *args, **kwargs):
+        # blocking retry loop, for one-off requests outside of the Fetcher
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except requests.exceptions.RequestException as exception:
+                delay = self.next_delay(attempt, exception)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
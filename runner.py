@@ -0,0 +1,232 @@
+"""runs every configured source in one process, concurrently.
+
+    python runner.py [--config sources.json] [--only ap_news flywheel]
+                     [--sink postgres] [--sink parquet]
+                     [--metrics-json metrics.json] [--metrics-prom metrics.prom]
+                     [--daemon [--duration SECONDS]]
+
+all sources share the same http session, notifier, caches, fingerprint and
+checkpoint stores. the exit status has bit i set when the i-th source that
+ran failed (0 means everything succeeded), and a line per source is printed
+either way. "indexedAt" checkpoints are only written for sources that succeeded.
+per-stage timings are printed at the end and can be written as json and
+prometheus text. with --daemon the process stays up and runs every source
+on its own schedule instead (see scheduler.py).
+"""
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import bootstrap
+import registry
+from checkpoints import get_checkpoints
+from fingerprints import get_fingerprints
+from frontier import get_frontier
+from http_session import get_session, stats
+from instrumentation import metrics, source
+
+
+# name -> "module:Class", imported only when the sink is used
+SINKS = {
+    "postgres": "pg_sink:PostgresSink",
+    "parquet": "parquet_sink:ParquetSink",
+}
+
+
+class SourceResult:
+    def __init__(self, name, ok, data_frame=None, error=None, elapsed=0.0):
+        self.name = name
+        self.ok = ok
+        self.data_frame = data_frame
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def rows(self):
+        return 0 if self.data_frame is None else self.data_frame.shape[0]
+
+    def __str__(self):
+        status = "ok" if self.ok else f"failed: {self.error}"
+        return f"[{self.name}] {status} - {self.rows} rows in {self.elapsed:.1f}s"
+
+
+def run_source(name, options=None, scrapers=None):
+    # scrapers, when given, keeps the scraper instances between runs
+    start = time.monotonic()
+    with source(name), metrics.timer("scrape"):
+        try:
+            scraper = None if scrapers is None else scrapers.get(name)
+            if scraper is None:
+                scraper = registry.create(name, **(options or {}))
+                if scrapers is not None:
+                    scrapers[name] = scraper
+            data_frame = scraper.scrape()
+            result = SourceResult(name, True, data_frame, elapsed=time.monotonic() - start)
+        except Exception as exception:
+            traceback.print_exc()
+            result = SourceResult(name, False, error=exception, elapsed=time.monotonic() - start)
+        metrics.count("rows", result.rows)
+        return result
+
+
+def run(sources, max_workers=None):
+    # sources is a list of (name, options), results come back in the same order
+    if not sources:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or len(sources)) as executor:
+        futures = [executor.submit(run_source, name, options) for name, options in sources]
+        return [future.result() for future in futures]
+
+
+def open_sinks(sink_names):
+    # (name, sink) pairs, sinks can be written to any number of times
+    return [(name, registry.resolve(SINKS[name])()) for name in sink_names]
+
+
+def close_sinks(sinks):
+    for _, sink in sinks:
+        sink.close()
+
+
+def write_sinks(results, sinks):
+    # every successful source's rows go to every sink. a source whose rows
+    # couldn't be written counts as failed, so its checkpoint isn't moved
+    for result in results:
+        if not result.ok or result.rows == 0:
+            continue
+        for sink_name, sink in sinks:
+            try:
+                with metrics.timer("sink", host=sink_name, source=result.name):
+                    sink.write(result.data_frame)
+            except Exception as exception:
+                traceback.print_exc()
+                result.ok = False
+                result.error = exception
+                break
+
+
+def commit_sources(names, failed=()):
+    """moves the given sources forward once their output is written: their
+    content fingerprints and "indexedAt" are stored, then their frontier is
+    cleared. a crash in between means scraping something twice, not losing
+    it. what the failed sources staged is dropped, their frontier is resumed
+    next run.
+    """
+    fingerprints = get_fingerprints()
+    fingerprints.commit(names)
+    fingerprints.discard(failed)
+    checkpoints = get_checkpoints()
+    if checkpoints is not None:
+        # only sources that finished move their "indexedAt" forward, in one update
+        checkpoints.commit(names)
+        checkpoints.discard(failed)
+    frontier = get_frontier()
+    for name in names:
+        frontier.complete(name)
+
+
+def report_metrics(json_path=None, prometheus_path=None):
+    # background notifications count too, so deliver them before reporting
+    from notifier import get_notifier
+
+    get_notifier().flush()
+    totals = metrics.stage_totals()
+    print(
+        "time per stage (summed over threads): "
+        + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in sorted(totals.items()))
+    )
+    write_metrics(json_path, prometheus_path)
+
+
+def write_metrics(json_path=None, prometheus_path=None):
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as file:
+            file.write(metrics.to_json())
+    if prometheus_path:
+        with open(prometheus_path, "w", encoding="utf-8") as file:
+            file.write(metrics.to_prometheus())
+
+
+def exit_status(results):
+    status = 0
+    for index, result in enumerate(results):
+        if not result.ok:
+            status |= 1 << index
+    # exit codes only go up to 255
+    return status if status < 256 else 255
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", help="sources config (default sources.json)")
+    parser.add_argument("--only", nargs="+", help="run just these sources")
+    parser.add_argument(
+        "--sink",
+        action="append",
+        choices=sorted(SINKS),
+        help="where to write the scraped rows, can be repeated (default: SCRAPER_SINKS)",
+    )
+    parser.add_argument("--metrics-json", help="write the run's metrics here as json")
+    parser.add_argument("--metrics-prom", help="write the run's metrics here in prometheus text format")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keep running, each source on its own schedule (SCHEDULE_INTERVAL etc.)",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        help="with --daemon, stop after this many seconds (default: until SIGTERM/ctrl-c)",
+    )
+    args = parser.parse_args(argv)
+    bootstrap.load_env()
+    bootstrap.setup_logging("scraper.log")
+
+    sources = registry.load_sources(args.config)
+    if args.only:
+        sources = [(name, options) for name, options in sources if name in args.only]
+
+    sink_names = args.sink or [name for name in os.getenv("SCRAPER_SINKS", "").split(",") if name]
+    metrics_json = args.metrics_json or os.getenv("METRICS_JSON")
+    metrics_prom = args.metrics_prom or os.getenv("METRICS_PROM")
+    if args.daemon:
+        from scheduler import run_daemon
+
+        return run_daemon(
+            sources,
+            sink_names,
+            schedules=registry.load_schedules(args.config),
+            duration=args.duration,
+            metrics_json=metrics_json,
+            metrics_prom=metrics_prom,
+        )
+
+    results = run(sources)
+    sinks = open_sinks(sink_names)
+    try:
+        write_sinks(results, sinks)
+    finally:
+        close_sinks(sinks)
+    # printed before anything is committed, without a sink this is the output
+    for result in results:
+        if result.data_frame is not None:
+            print(result.data_frame)
+    commit_sources(
+        [result.name for result in results if result.ok],
+        [result.name for result in results if not result.ok],
+    )
+    for result in results:
+        print(result)
+    print(f"http connections: {stats.as_dict()}")
+    rate_limiter = get_session().rate_limiter
+    if rate_limiter is not None:
+        print(f"rate limiting: {rate_limiter.as_dict()}")
+    report_metrics(metrics_json, metrics_prom)
+    return exit_status(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""daemon mode: one resident process runs every source on its own schedule.
+
+    python runner.py --daemon [--only ...] [--sink ...] [--duration 3300]
+
+the http session, connection pools, checkpoint/fingerprint/frontier stores,
+caches, sinks and the scraper instances themselves are created once and
+reused by every run, so a run costs its requests and nothing else. a source
+never overlaps with itself: its next run is only scheduled once the current
+one is done. every run's rows are printed and written to the sinks before
+its checkpoints are committed, as in a one-shot run. SIGTERM or ctrl-c lets
+the running sources finish and exits.
+
+every source waits SCHEDULE_INTERVAL seconds (default 60) between runs, or
+the "interval" of its sources.json entry. a run that finds nothing new
+doubles the wait, up to SCHEDULE_MAX_INTERVAL / "max_interval" (default 30
+times the interval), and the first run with new rows brings it back down.
+waits are spread by +-SCHEDULE_JITTER / "jitter" (default 0.1).
+"""
+import os
+import random
+import signal
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import runner
+from instrumentation import metrics
+
+
+class Schedule:
+    # how long a source waits before its next run, see the module docstring
+    def __init__(self, interval, max_interval=None, jitter=0.1, backoff=2.0):
+        self.interval = interval
+        self.max_interval = max(max_interval or interval, interval)
+        self.jitter = jitter
+        self.backoff = backoff
+        self.current = interval
+
+    @classmethod
+    def from_config(cls, config=None):
+        config = config or {}
+        interval = float(config.get("interval", os.getenv("SCHEDULE_INTERVAL", "60")))
+        max_interval = float(
+            config.get("max_interval", os.getenv("SCHEDULE_MAX_INTERVAL", str(interval * 30)))
+        )
+        jitter = float(config.get("jitter", os.getenv("SCHEDULE_JITTER", "0.1")))
+        return cls(interval, max_interval, jitter)
+
+    def next_delay(self, changed):
+        # failed runs back off as well, a broken site isn't hammered every minute
+        if changed:
+            self.current = self.interval
+        else:
+            self.current = min(self.current * self.backoff, self.max_interval)
+        return self.current * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class Scheduler:
+    def __init__(self, sources, sinks=(), schedules=None, metrics_json=None, metrics_prom=None):
+        # sources is a list of (name, options), sinks come from runner.open_sinks
+        self.sources = dict(sources)
+        self.sinks = sinks
+        self.schedules = {
+            name: Schedule.from_config((schedules or {}).get(name)) for name in self.sources
+        }
+        self.metrics_json = metrics_json
+        self.metrics_prom = metrics_prom
+        self.__scrapers = {}
+        # name -> the SourceResult of its latest run
+        self.__last_results = {}
+        # name -> monotonic time of the next run, None while it's running
+        self.__due = dict.fromkeys(self.sources, time.monotonic())
+        self.__lock = threading.Lock()
+        # sinks and commits aren't meant for several threads at once
+        self.__commit_lock = threading.Lock()
+        self.__wake = threading.Event()
+        self.__stopping = threading.Event()
+
+    def stop(self, *args):
+        # also usable as a signal handler
+        self.__stopping.set()
+        self.__wake.set()
+
+    def __run_once(self, name):
+        result = runner.run_source(name, self.sources[name], scrapers=self.__scrapers)
+        try:
+            with self.__commit_lock:
+                # like a one-shot run, the rows are printed before anything is
+                # committed, without a sink this is the output
+                if result.data_frame is not None:
+                    print(result.data_frame)
+                runner.write_sinks([result], self.sinks)
+                if result.ok:
+                    runner.commit_sources([name])
+                else:
+                    runner.commit_sources([], failed=[name])
+                runner.write_metrics(self.metrics_json, self.metrics_prom)
+        except Exception as exception:
+            # still scheduled again, the frontier picks up where this left off
+            traceback.print_exc()
+            result.ok = False
+            result.error = exception
+        delay = self.schedules[name].next_delay(result.ok and result.rows > 0)
+        metrics.count("scheduled_runs", source=name, status="ok" if result.ok else "failed")
+        print(f"{result}, next run in {delay:.0f}s")
+        with self.__lock:
+            self.__last_results[name] = result
+            self.__due[name] = time.monotonic() + delay
+        self.__wake.set()
+
+    def last_results(self):
+        # the latest result of every source that ran, in config order
+        with self.__lock:
+            return [
+                self.__last_results[name] for name in self.sources if name in self.__last_results
+            ]
+
+    def __start_due(self, executor):
+        # starts whatever is due and returns how long until the next one is
+        now = time.monotonic()
+        wait = None
+        with self.__lock:
+            for name, due in self.__due.items():
+                if due is None:
+                    continue
+                if due <= now:
+                    self.__due[name] = None
+                    executor.submit(self.__run_once, name)
+                elif wait is None or due - now < wait:
+                    wait = due - now
+        return wait
+
+    def run(self, duration=None):
+        deadline = None if duration is None else time.monotonic() + duration
+        with ThreadPoolExecutor(max_workers=max(len(self.sources), 1)) as executor:
+            while not self.__stopping.is_set():
+                wait = self.__start_due(executor)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    wait = remaining if wait is None else min(wait, remaining)
+                self.__wake.wait(wait)
+                self.__wake.clear()
+            print("stopping, waiting for running sources to finish")
+        # leaving the executor waited for them
+
+
+def run_daemon(sources, sink_names=(), schedules=None, duration=None, metrics_json=None, metrics_prom=None):
+    sinks = runner.open_sinks(sink_names)
+    scheduler = Scheduler(sources, sinks, schedules, metrics_json, metrics_prom)
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    try:
+        scheduler.run(duration)
+    finally:
+        runner.close_sinks(sinks)
+    runner.report_metrics(metrics_json, metrics_prom)
+    # non-zero when a source's latest run failed, same bits as a one-shot run
+    return runner.exit_status(scheduler.last_results())
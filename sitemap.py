@@ -0,0 +1,130 @@
+import gzip
+import io
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+GZIP_MAGIC = b"\x1f\x8b"
+UTF8_BOM = b"\xef\xbb\xbf"
+
+
+def parse_lastmod(value):
+    # W3C datetime ("2023-04-20", "2023-04-20T10:00:00+00:00", "...Z"), naive
+    # values are taken as utc. returns None for anything unparseable
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def parse_rfc822(value):
+    # rss pubDate, e.g. "Thu, 20 Apr 2023 10:00:00 GMT"
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value.strip())
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _open(source):
+    # bytes, a path or a binary file object; gzip is detected by its magic bytes
+    if isinstance(source, (bytes, bytearray)):
+        stream = io.BufferedReader(io.BytesIO(source))
+        head = bytes(source[:2])
+    else:
+        if isinstance(source, str):
+            source = open(source, "rb")
+        stream = source if hasattr(source, "peek") else io.BufferedReader(source)
+        head = stream.peek(2)[:2]
+    if head == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def _is_text(stream):
+    # a text sitemap is one url per line, anything xml starts with "<"
+    head = stream.peek(512).lstrip(UTF8_BOM).lstrip()
+    return bool(head) and not head.startswith(b"<")
+
+
+def _iter_text(stream):
+    for line in stream:
+        loc = line.decode("utf-8", errors="replace").strip().lstrip("\ufeff")
+        if loc:
+            yield loc, None
+
+
+def _entry(element):
+    # (kind, loc, lastmod text) for sitemap <url>/<sitemap>, rss <item> and
+    # atom <entry> elements
+    from lxml import etree
+
+    kind = etree.QName(element).localname
+    if kind == "item":
+        return kind, element.findtext("link"), element.findtext("pubDate")
+    if kind == "entry":
+        link = element.find("{*}link")
+        loc = link.get("href") if link is not None else None
+        return kind, loc, element.findtext("{*}updated") or element.findtext("{*}published")
+    return kind, element.findtext("{*}loc"), element.findtext("{*}lastmod")
+
+
+def iter_sitemap(source, fetch=None, max_depth=3):
+    """yields (loc, lastmod) for every <url> in a sitemap, lastmod being an
+    aware datetime or None. rss and atom feeds work too (item link/pubDate,
+    entry link/updated), and so do text sitemaps with one url per line
+    (lastmod is always None there), since discovery can turn those up
+    instead.
+
+    the document is read with iterparse and every element is cleared once
+    handled, so memory stays flat however many entries there are. for a
+    sitemap index, fetch(loc) is called for each child sitemap (returning
+    the same kinds of source, or None to skip it) and its urls are yielded
+    in turn.
+    """
+    from lxml import etree
+
+    stream = _open(source)
+    try:
+        if _is_text(stream):
+            yield from _iter_text(stream)
+            return
+        for _, element in etree.iterparse(
+            stream,
+            events=("end",),
+            tag=("{*}url", "{*}sitemap", "item", "{*}entry"),
+            huge_tree=True,
+        ):
+            kind, loc, lastmod = _entry(element)
+
+            # drop this element and everything before it
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+            if loc is None:
+                continue
+            loc = loc.strip()
+            if kind == "sitemap":
+                if fetch is not None and max_depth > 0:
+                    child = fetch(loc)
+                    if child is not None:
+                        yield from iter_sitemap(child, fetch, max_depth - 1)
+                continue
+            if kind == "item":
+                yield loc, parse_rfc822(lastmod)
+                continue
+            yield loc, parse_lastmod(lastmod)
+    finally:
+        stream.close()